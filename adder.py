@@ -1,5 +1,6 @@
 from cnf import *
 from ortools.sat.python import cp_model
+import solver_telemetry
 
 def add_constraint_to_model(cnf, model, variables):
     for disj in cnf:
@@ -72,9 +73,8 @@ def input_output_adder(a_bit_values, b_bit_values):
         model.Add(variables[b_bits[i]] == b_bit_values[i])
 
     solver = cp_model.CpSolver()
-    status = solver.Solve(model)
-    #print("Branches: %f" %solver.NumBranches())
-    #print("Wall time: %f" %solver.WallTime())
+    status = solver_telemetry.solve(solver, model, "adder.input_output_adder",
+                                    num_bits=num_bits)
     return [solver.Value(variables[out_bit]) for out_bit in out_bits]
 
 # This function takes the output bits (list of N bits, low-order bit first)
@@ -98,7 +98,9 @@ def output_input_adder(out_bit_values):
     solver = cp_model.CpSolver()
     # BEGIN STUDENT CODE
     collector = SolutionCollector(a_bits, b_bits, variables, solutions)
-    solver.SearchForAllSolutions(model, collector)
+    solver.parameters.enumerate_all_solutions = True
+    solver_telemetry.solve(solver, model, "adder.output_input_adder",
+                           collector, num_bits=num_bits)
     # END STUDENT CODE
 
     return solutions
@@ -2,8 +2,10 @@
 import argparse, dill, ortools
 from ortools.sat.python import cp_model
 import visualize_solution as vs
-from job_scheduler import PartsTask, JobScheduler
-from parse_orders import get, parse_orders
+from job_scheduler import PartsTask, JobScheduler, add_solver_arguments, \
+     solver_options_from_args
+from parse_orders import parse_orders
+from verify_solution import verify_solution
 from greenhouse_scheduler import GreenhouseScheduler, BehaviorInfo
 import schedule as sched
 
@@ -22,8 +24,10 @@ parser.add_argument('-g', '--graphics', action='store_true',
                     help="Visualize the schedules")
 parser.add_argument('-v', '--verbose', action='store_true',
                     help="Verbose output")
+add_solver_arguments(parser)
 
 args = parser.parse_args()
+solver_options = solver_options_from_args(args)
 
 ##########################################################
 #   JOB SCHEDULING AUTOGRADER
@@ -67,8 +71,13 @@ class JS_Test:
         solution, solver = self.order.solve()
         is_solved = False
         if (verbose):
+            stats = self.order.solve_stats(solver)
+            print(" Status: %s" %stats['status'])
             print(" Branches: %d" %solver.NumBranches())
             print(" Wall time: %f" %solver.WallTime())
+            print(" Best bound: %f" %stats['bound'])
+            if (stats['gap'] is not None):
+                print(" Gap: %.4f" %stats['gap'])
         if (solution == None):
             print("  Infeasible schedule!!")
         elif (len(solution) == 0):
@@ -96,36 +105,22 @@ class JS_Test:
         else: self.solution.print_solution(type, self.order.jobs)
             
 # refsol is a list [schedule, objective, value, cost]
-def is_schedule_correct(test, js_class, refsol, max_constraint, verbose=False):
+# The solution is checked with verify_solution, against the order itself,
+#   rather than by building and solving a second (reference) model of it
+def is_schedule_correct(test, refsol, max_constraint, verbose=False):
     order = test.order
-    tname = order.name
     solution = test.solution.solution
 
-    ref_order = js_class(tname, order.deadline, order.jobs, order.tasks,
-                         order.machines, order.parts, order.tools,
-                         order.use_costs, order.use_parts)
-    ref_test = JS_Test(ref_order, max_constraint)
-
-    # Check whether solution is compatible with the refsol class constraints
     is_correct = True
-    ref_model = ref_order.model
-    try:
-        for jname in solution:
-            tasks = get(jname, test.order.jobs).tasks
-            for idx, (mname, start, duration) in enumerate(solution[jname]):
-                tname = tasks[idx].name
-                end = start + duration
-                ref_model.Add(ref_order.scheduleds[jname, tname, mname] == True)
-                ref_model.Add(ref_order.starts[jname, tname, mname] == start)
-                ref_model.Add(ref_order.ends[jname, tname, mname] == end)
-        is_solved = ref_test.solve(False, False)
-        #status = cp_model.CpSolver().Solve(ref_model)
-    except Exception as inst:
-        print("EXCEPTION", inst.args); status = cp_model.INFEASIBLE
-        is_solved = False
-
-    if (not is_solved):
+    verification = verify_solution(order, solution, max_constraint)
+    if (not verification.is_valid()):
         print("INCORRECT: Your solution is infeasible given the refsol constraints")
+        for violation in verification.violations:
+            print("  %s: %s" %(violation.type, violation.message))
+        is_correct = False
+    elif (verification.objective != test.solution.objective):
+        print("INCORRECT: Your objective (%d) is not that of your solution (%d)"
+              %(test.solution.objective, verification.objective))
         is_correct = False
     elif (test.solution.objective != refsol.objective):
         print("INCORRECT: Your solution is NOT consistent with the refsol constraints")
@@ -141,9 +136,10 @@ def is_schedule_correct(test, js_class, refsol, max_constraint, verbose=False):
 
 def check_solution_syntax(solution, test):
     for jname in solution:
-        if (not get(jname, test.jobs)): return False
+        if (not jname in test.jobs_by_name): return False
         for mname, start, duration in solution[jname]:
-            if (not get(mname, test.machines) or start < 0 or duration < 1):
+            if (not mname in test.machines_by_name or start < 0
+                or duration < 1):
                 return False
     return True
 
@@ -154,14 +150,14 @@ def plot_schedule(test):
     for job_id, job in enumerate(order.jobs):
         if (job.name in solution):
             for machine, start, duration in solution[job.name]:
-                assigned_jobs[get(machine, order.machines).id,
+                assigned_jobs[order.machines_by_name[machine].id,
                               job_id] = (True, start, duration,
                                          start+duration)
     vs.plot_intervals([job.name for job in order.jobs],
                       order.deadline, True, assigned_jobs)
 
-def do_scheduling_test(order, js_class, refsol, max_constraint,
-                       visualize=False, verbose=False):
+def do_scheduling_test(order, refsol, max_constraint, visualize=False,
+                       verbose=False):
     print("Running test %s, constraints: %s"
           %(order.name, list(range(1, max_constraint+1))))
     if verbose: print(" Costs: %s, Parts: %s" %(order.use_costs, order.use_parts))
@@ -169,8 +165,7 @@ def do_scheduling_test(order, js_class, refsol, max_constraint,
     status = test.solve(verbose, visualize)
 
     if (test.solution):
-        correct = is_schedule_correct(test, js_class, refsol, max_constraint,
-                                      verbose)
+        correct = is_schedule_correct(test, refsol, max_constraint, verbose)
         if (visualize): plot_schedule(test)
         print('')
         return correct
@@ -180,7 +175,7 @@ def do_scheduling_test(order, js_class, refsol, max_constraint,
 
 def add_orders(filename):
     orders = {}
-    for order in parse_orders(filename):
+    for order in parse_orders(filename, solver_options):
         if (orders.get(order.name)):
             raise Exception("Order %s already loaded" %order.name)
         orders[order.name] = order
@@ -195,7 +190,7 @@ def job_scheduling_autograder():
     global grand_tot_correct, grand_tot_num, grand_tot_points
 
     with open(jobs_refsol_file, "rb") as f:
-        js_class, js_solutions = dill.load(f)
+        _, js_solutions = dill.load(f)
 
     step_points = [2, 2, 3, 3, 5, 5, 5, 2]
     tot_correct = tot_num = tot_points = 0
@@ -217,9 +212,8 @@ def job_scheduling_autograder():
         max_constraint = step
         for test_name in tests:
             order = orders[test_name]
-            correct += do_scheduling_test(order, js_class,
-                                          js_solutions[order.name], step,
-                                          args.graphics, args.verbose)
+            correct += do_scheduling_test(order, js_solutions[order.name],
+                                          step, args.graphics, args.verbose)
 
         points = step_points[step-1]*correct/len(tests)
         print("Part 1, Step %d: %d correct out of %d (%.1f points)\n"
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# Solve many orders in parallel, in a pool of processes.
+# Each order is sent to the workers as plain order data (see
+#   parse_orders.order_data), and the worker rebuilds the JobScheduler and
+#   its model, so no OR-tools objects need to be pickled
+import copy, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import job_scheduler as js
+from parse_orders import parse_orders, iter_orders, order_data, create_order
+
+class BatchResult(object):
+    def __init__(self, name, solution, status, objective, value, cost,
+                 build_time, solve_time):
+        self.name = name
+        self.solution = solution
+        self.status = status
+        self.objective = objective
+        self.value = value
+        self.cost = cost
+        self.build_time = build_time
+        self.solve_time = solve_time
+
+    def __repr__(self):
+        return ("<BatchResult %s: %s %s (build %.3fs, solve %.3fs)>"
+                %(self.name, self.status, self.objective, self.build_time,
+                  self.solve_time))
+
+# Build and solve one order from its order data; runs in the worker process
+def solve_order_data(data, max_constraint, options):
+    start = time.perf_counter()
+    order = create_order(*data)
+    order.create_model(max_constraint)
+    build_time = time.perf_counter() - start
+    solution, solver = order.solve(options)
+    solve_time = time.perf_counter() - start - build_time
+    stats = order.solve_stats(solver)
+    objective = value = cost = None
+    if (solution is not None):
+        objective = solver.Value(order.objective)
+        value = solver.Value(order.value)
+        cost = solver.Value(order.cost) if order.has_costs else 0
+    return BatchResult(order.name, solution, stats['status'], objective,
+                       value, cost, build_time, solve_time)
+
+# Return the order data of the orders.  Order files are read with
+#   parse_orders (with its cache, if use_cache), or incrementally with
+#   iter_orders if stream (which needs each Task-Machine line to come before
+#   the orders that use its task)
+def iter_order_data(orders, stream=False, use_cache=False):
+    for order in orders:
+        if (isinstance(order, str)):
+            file_orders = (iter_orders(order) if stream else
+                           parse_orders(order, use_cache=use_cache))
+            for file_order in file_orders: yield order_data(file_order)
+        else:
+            yield order_data(order)
+
+# Solve a list of orders (JobScheduler instances) or of order files, and
+#   yield a BatchResult for each order as soon as it is solved.  If stream,
+#   orders in files are sent to the workers as soon as they are parsed; if
+#   use_cache, the files' parsed items are cached (see parse_orders).
+# max_workers: the number of processes (defaults to the number of CPUs)
+# options: the SolverOptions for each solve.  If its num_search_workers is
+#   not set, the CPUs are divided among the processes, so that the CP-SAT
+#   workers in all the processes don't oversubscribe the cores
+def solve_batch(orders, max_constraint=7, options=None, max_workers=None,
+                stream=False, use_cache=False):
+    cpus = os.cpu_count() or 1
+    max_workers = max_workers or cpus
+    options = options if options is not None else js.SolverOptions()
+    if (options.num_search_workers is None):
+        options = copy.copy(options)
+        options.num_search_workers = max(1, cpus//max_workers)
+
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = [executor.submit(solve_order_data, data, max_constraint,
+                                   options)
+                   for data in iter_order_data(orders, stream, use_cache)]
+        for future in as_completed(futures):
+            yield future.result()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filenames', nargs='+', help='The order files to solve')
+    parser.add_argument('-j', '--jobs', default=None, type=int,
+                        help='Number of processes (defaults to the number of CPUs)')
+    parser.add_argument('-c', '--max-constraint', default=7, type=int,
+                        help='Add all constraints up to this one')
+    parser.add_argument('--stream', action='store_true',
+                        help='Solve orders as soon as they are read (Task-Machine lines must come before the orders that use them)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache the parsed items in a file next to each order file')
+    js.add_solver_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for result in solve_batch(args.filenames, args.max_constraint,
+                              js.solver_options_from_args(args), args.jobs,
+                              args.stream, args.cache):
+        print(result)
+    print("Total time: %.3fs" %(time.perf_counter() - start))
@@ -0,0 +1,705 @@
+#!/usr/bin/env python
+# Timing benchmarks for the schedulers.
+# Use "python benchmark.py -b ?" to see which benchmarks are available
+import argparse, contextlib, csv, io, json, os, shutil, subprocess, tempfile, time
+import job_scheduler as js
+import layers
+from generate_orders import generate_order
+from parse_orders import parse_orders, write_orders, read_items, \
+     read_items_cached
+from job_lns import JobSchedulerLNS
+from verify_solution import verify_solution
+from greenhouse_scheduler import GreenhouseScheduler, BehaviorInfo, \
+     ObjectiveWeights, MultiDayGreenhouseScheduler, explainInfeasibility, \
+     relaxBehaviorsInfo
+from greenhouse_interval_scheduler import GreenhouseIntervalScheduler
+from schedule_cache import ScheduleCache, defaultBehaviorsInfo, \
+     lightPresets, raiseMoistPresets
+
+order_files = ["grader_files/orders_s%d.txt" %step for step in range(1, 9)]
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-b', '--benchmark', default=None,
+                    help='Which benchmarks to run - can be a single benchmark or list, (defaults to all); use ? to see which are valid')
+parser.add_argument('--seed', default=0, type=int,
+                    help='Random seed for the synthetic orders')
+parser.add_argument('--time-limit', default=10.0, type=float,
+                    help='Time limit, in seconds, for each solve in the scaling benchmark')
+parser.add_argument('-o', '--output', default=None,
+                    help='Write the scaling results to this file (.csv or .json)')
+parser.add_argument('--label', default=None,
+                    help='Label for the scaling results (defaults to the git commit)')
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_create_model(args):
+    print("JobScheduler.create_model on synthetic orders")
+    print("%8s %10s %10s" %("jobs", "keys", "build (s)"))
+    for num_jobs in [10, 100, 1000, 10000]:
+        order = generate_order(num_jobs, seed=args.seed)
+        _, elapsed = timed(order.create_model, 7)
+        print("%8d %10d %10.3f" %(num_jobs, len(order.scheduleds), elapsed))
+
+# Return a copy of the order with the given jobs
+def order_with_jobs(order, jobs):
+    return js.JobScheduler(order.name, order.deadline, jobs, order.tasks,
+                           order.machines, order.parts, order.tools,
+                           order.use_costs, order.use_parts)
+
+# Solve each order with its last job removed, then add the job back and
+#   compare re-solving from scratch against re-solving with the previous
+#   solution as hints
+def bench_warm_start(args):
+    print("Cold vs. hinted re-solve after adding a job")
+    print("%-8s %10s %10s %8s" %("order", "cold (s)", "hinted (s)", "speedup"))
+    for filename in order_files:
+        for order in parse_orders(filename):
+            if (len(order.jobs) < 2): continue
+            previous = order_with_jobs(order, order.jobs[:-1])
+            previous.create_model(7)
+            solution, _ = previous.solve()
+            if (solution is None): continue
+
+            order.create_model(7)
+            _, solver = order.solve()
+            cold = solver.WallTime()
+            order.create_model(7)
+            order.add_hints(solution)
+            _, solver = order.solve()
+            hinted = solver.WallTime()
+            print("%-8s %10.3f %10.3f %7.1fx" %(order.name, cold, hinted,
+                                                cold/max(hinted, 1e-6)))
+
+# Compare the objective over time of the LNS against a single CP-SAT solve
+#   with the same total time budget, on an order with more jobs than fit
+#   before the deadline
+def bench_lns(args):
+    num_jobs, deadline, iterations, iteration_time = 300, 40, 30, 1.0
+    print("LNS vs. monolithic solve: %d jobs, deadline %d"
+          %(num_jobs, deadline))
+    for neighborhood in ['mixed', 'time_window', 'machine', 'random_jobs']:
+        order = generate_order(num_jobs, deadline=deadline, seed=args.seed)
+        lns = JobSchedulerLNS(order, neighborhood, iterations,
+                              initial_time=iteration_time,
+                              iteration_time=iteration_time, seed=args.seed)
+        _, history = lns.solve()
+        print(" LNS (%s): %s" %(neighborhood,
+                                ", ".join(["%.1fs: %d" %(elapsed, objective)
+                                           for elapsed, _, objective
+                                           in history[::5] + history[-1:]])))
+    budget = history[-1][0]
+    order = generate_order(num_jobs, deadline=deadline, seed=args.seed)
+    order.create_model(7)
+    solution, solver = order.solve(js.SolverOptions(max_time_in_seconds=budget))
+    print(" Monolithic (%.1fs): %s" %(budget, order.solve_stats(solver)))
+
+# Compare the branches and wall time of solving with and without the
+#   presolve pass (tightened domains, direct task completion encoding)
+def bench_presolve(args):
+    print("Presolve on %s (branches / wall time)" %order_files[7])
+    print("%-8s %9s %18s %18s" %("order", "objective", "original",
+                                  "presolve"))
+    for order in parse_orders(order_files[7]):
+        results = []
+        for presolve in [False, True]:
+            order.create_model(8, presolve)
+            _, solver = order.solve()
+            stats = order.solve_stats(solver)
+            results.append("%8d / %7.3fs" %(stats['branches'],
+                                            stats['wall_time']))
+        print("%-8s %9d %18s %18s" %(order.name, stats['objective'],
+                                     results[0], results[1]))
+
+# The tools constraint as a reservoir: each scheduled task takes its tools
+#   at its start and returns them at its end
+class ReservoirToolsScheduler(js.JobScheduler):
+    def create_tools_constraints(self):
+        for tool in self.tools:
+            times, demands, actives = [], [], []
+            for task in self.tasks:
+                if tool in task.tools:
+                    count = task.tools.count(tool)
+                    keys = self.keys_by_task.get(task.name, [])
+                    scheds = self._vars(self.scheduleds, keys)
+                    times += (self._vars(self.starts, keys) +
+                              self._vars(self.ends, keys))
+                    demands += [count]*len(scheds) + [-count]*len(scheds)
+                    actives += scheds + scheds
+            if (times):
+                self.model.AddReservoirConstraintWithActive(times, demands,
+                                                            actives, 0,
+                                                            tool.num)
+
+# Compare the cumulative tools constraint against the same constraint as a
+#   reservoir, on the orders with tools: the objectives must be the same, and
+#   the solutions valid
+def bench_tools_cumulative(args):
+    print("Tools constraint: reservoir vs. cumulative (time limit %.1fs)"
+          %args.time_limit)
+    print("%-14s %10s %10s %14s %14s %6s" %("order", "reservoir", "cumulative",
+                                             "reservoir (s)", "cumulative (s)",
+                                             "valid"))
+    orders = [(order, step) for step in range(5, 9)
+              for order in parse_orders(order_files[step-1]) if order.tools]
+    orders += [(generate_order(num_jobs, num_tools=3, deadline=num_jobs,
+                               seed=args.seed), 5) for num_jobs in [30, 60]]
+    options = js.SolverOptions(max_time_in_seconds=args.time_limit)
+    for order, max_constraint in orders:
+        results = []
+        for js_class in [ReservoirToolsScheduler, js.JobScheduler]:
+            copy = js_class(order.name, order.deadline, order.jobs,
+                            order.tasks, order.machines, order.parts,
+                            order.tools, order.use_costs, order.use_parts)
+            copy.create_model(max_constraint)
+            solution, solver = copy.solve(options)
+            stats = copy.solve_stats(solver)
+            results.append((stats['objective'], stats['wall_time'],
+                            stats['status']))
+        valid = (solution is not None and
+                 verify_solution(copy, solution, max_constraint).is_valid())
+        # Both optimal, but not the same constraint
+        differ = (results[0][2] == results[1][2] == 'OPTIMAL' and
+                  results[0][0] != results[1][0])
+        print("%-14s %10s %10s %14.3f %14.3f %6s%s"
+              %(order.name, results[0][0], results[1][0], results[0][1],
+                results[1][1], valid, "  (objectives differ)" if differ else ""))
+
+# Solve the orders with parts, with and without an extra part that no task
+#   uses or makes (which has no reservoir events): the objectives must be the
+#   same, and the solutions valid
+def bench_unused_parts(args):
+    print("Parts no task uses or makes")
+    print("%-8s %10s %12s %6s" %("order", "objective", "unused part", "valid"))
+    for step in [6, 7, 8]:
+        for order in parse_orders(order_files[step-1]):
+            if (not order.parts): continue
+            objectives = []
+            for parts in [order.parts, order.parts + [js.Part("Unused", 1, 1)]]:
+                copy = js.JobScheduler(order.name, order.deadline, order.jobs,
+                                       order.tasks, order.machines, parts,
+                                       order.tools, order.use_costs,
+                                       order.use_parts)
+                copy.create_model(step)
+                solution, solver = copy.solve()
+                objectives.append(copy.solve_stats(solver)['objective'])
+            valid = (solution is not None and
+                     verify_solution(copy, solution, step).is_valid())
+            print("%-8s %10s %12s %6s%s"
+                  %(order.name, objectives[0], objectives[1], valid,
+                    "" if objectives[0] == objectives[1]
+                    else "  (objectives differ)"))
+
+# Time parsing a generated order file of about 50,000 lines
+def bench_parse(args):
+    order = generate_order(40000, num_tasks=3000, num_machines=50,
+                            seed=args.seed)
+    handle, filename = tempfile.mkstemp(suffix=".txt")
+    os.close(handle)
+    try:
+        write_orders(filename, [order])
+        with open(filename) as f: num_lines = len(f.readlines())
+        orders, elapsed = timed(parse_orders, filename)
+        print("Parsed %d lines (%d jobs, %d tasks) in %.3fs"
+              %(num_lines, len(orders[0].jobs), len(orders[0].tasks), elapsed))
+    finally:
+        os.remove(filename)
+
+# Time loading the item tables of a generated order file of about 50,000
+#   lines without the cache, when the cache is written, and from the cache
+def bench_cache(args):
+    order = generate_order(40000, num_tasks=3000, num_machines=50,
+                            seed=args.seed)
+    dirname = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(dirname, "orders.txt")
+        write_orders(filename, [order])
+        _, uncached = timed(read_items, filename)
+        _, cold = timed(read_items_cached, filename)
+        _, warm = timed(read_items_cached, filename)
+        print("Order item tables: no cache %.3fs, cold (writing cache) %.3fs, "
+              "warm %.3fs" %(uncached, cold, warm))
+        _, elapsed = timed(parse_orders, filename)
+        _, cached = timed(parse_orders, filename, use_cache=True)
+        print("parse_orders: no cache %.3fs, warm cache %.3fs"
+              %(elapsed, cached))
+    finally:
+        shutil.rmtree(dirname)
+
+# Parameters of generate_order for the scaling benchmark: each parameter
+#   in scaling_sweeps is varied in turn, with the others as in scaling_base
+scaling_base = {'num_jobs': 20, 'tasks_per_job': 3, 'num_machines': 11,
+                'num_tools': 0, 'num_parts': 0, 'num_parts_tasks': 0,
+                'deadline': 30}
+scaling_sweeps = {'num_jobs': [10, 20, 50, 100, 200],
+                  'tasks_per_job': [2, 3, 4, 6],
+                  'num_machines': [3, 5, 11, 20],
+                  'num_tools': [0, 2, 4],
+                  'num_parts': [0, 2, 4],
+                  'num_parts_tasks': [0, 2, 4],
+                  'deadline': [15, 30, 60, 120]}
+
+def git_label():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+# Sweep the generate_order parameters through create_model and solve,
+#   recording the model build time, solve time, branches, conflicts and
+#   objective gap of each
+def bench_scaling(args):
+    label = args.label or git_label()
+    options = js.SolverOptions(max_time_in_seconds=args.time_limit,
+                               random_seed=args.seed)
+    fields = (["label", "parameter"] + list(scaling_base) +
+              ["keys", "build_time", "solve_time", "status", "objective",
+               "bound", "gap", "branches", "conflicts"])
+    print("Scaling (%s, time limit %.1fs)" %(label, args.time_limit))
+    print("%-16s %6s %8s %9s %9s %10s %10s %10s %8s"
+          %("parameter", "value", "keys", "build (s)", "solve (s)", "status",
+            "branches", "conflicts", "gap"))
+    rows = []
+    for parameter, values in scaling_sweeps.items():
+        for value in values:
+            params = dict(scaling_base)
+            params[parameter] = value
+            if (params['num_parts_tasks'] > 0 and params['num_parts'] == 0):
+                params['num_parts'] = 2
+            order = generate_order(seed=args.seed, **params)
+            _, build_time = timed(order.create_model, 8)
+            _, solver = order.solve(options)
+            stats = order.solve_stats(solver)
+            row = dict(params, label=label, parameter=parameter,
+                       keys=len(order.scheduleds), build_time=build_time,
+                       solve_time=stats['wall_time'], status=stats['status'],
+                       objective=stats['objective'], bound=stats['bound'],
+                       gap=stats['gap'], branches=stats['branches'],
+                       conflicts=stats['conflicts'])
+            rows.append(row)
+            print("%-16s %6d %8d %9.3f %9.3f %10s %10d %10d %8s"
+                  %(parameter, value, row['keys'], build_time,
+                    row['solve_time'], row['status'], row['branches'],
+                    row['conflicts'],
+                    "-" if row['gap'] is None else "%.4f" %row['gap']))
+
+    if (args.output and args.output.endswith(".json")):
+        with open(args.output, "w") as f: json.dump(rows, f, indent=1)
+    elif (args.output):
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+# Compare building the model of an order against loading a saved model
+#   (loading parses a text-format proto, so it is not expected to be faster)
+def bench_model_io(args):
+    print("Building vs. loading saved models")
+    print("%8s %10s %10s %10s %10s" %("jobs", "build (s)", "save (s)",
+                                      "load (s)", "size (MB)"))
+    dirname = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(dirname, "order.model")
+        for num_jobs in [100, 1000, 5000]:
+            order = generate_order(num_jobs, seed=args.seed)
+            _, build = timed(order.create_model, 7)
+            _, save = timed(order.save_model, filename)
+            _, load = timed(js.load_model, filename)
+            print("%8d %10.3f %10.3f %10.3f %10.1f"
+                  %(num_jobs, build, save, load,
+                    os.path.getsize(filename)/1e6))
+    finally:
+        shutil.rmtree(dirname)
+
+# Compare checking solutions with verify_solution against checking them
+#   with CP-SAT, on a copy of the built model, and against rebuilding the
+#   model to check them (as the autograder did)
+def bench_verify(args):
+    print("verify_solution vs. CP-SAT check_solution vs. rebuilding the model")
+    print("%-14s %6s %14s %14s %14s" %("order", "jobs", "verify (ms)",
+                                        "CP-SAT (ms)", "rebuild (ms)"))
+    orders = [(order, 8) for order in parse_orders(order_files[7])]
+    orders += [(generate_order(num_jobs, deadline=5*num_jobs, seed=args.seed), 7)
+               for num_jobs in [100, 300]]
+    for order, max_constraint in orders:
+        order.create_model(max_constraint)
+        solution, _ = order.solve(js.SolverOptions(max_time_in_seconds=
+                                                   args.time_limit))
+        if (solution is None): continue
+        repeat = 100
+        _, verify = timed(lambda: [verify_solution(order, solution,
+                                                   max_constraint)
+                                   for _ in range(repeat)])
+        _, check = timed(order.check_solution, solution)
+        _, rebuild = timed(rebuild_check, order, solution, max_constraint)
+        print("%-14s %6d %14.3f %14.3f %14.3f"
+              %(order.name, len(order.jobs), 1000*verify/repeat,
+                1000*check, 1000*rebuild))
+
+# Check a solution by building a new model of the order and fixing the
+#   solution in it
+def rebuild_check(order, solution, max_constraint):
+    copy = js.JobScheduler(order.name, order.deadline, order.jobs, order.tasks,
+                           order.machines, order.parts, order.tools,
+                           order.use_costs, order.use_parts)
+    copy.create_model(max_constraint)
+    copy.add_solution_constraints(solution)
+    return copy.solve()[0] is not None
+
+# Compare solving with and without symmetry breaking, on orders with
+#   identical copies of each machine and few distinct tasks (so that many
+#   jobs are identical), with a single search worker and with the default
+def bench_symmetry(args):
+    print("Symmetry breaking (time limit %.1fs)" %args.time_limit)
+    print("%-22s %8s %9s %10s %10s %10s %9s %10s"
+          %("order", "workers", "symmetry", "status", "objective", "bound",
+            "solve (s)", "branches"))
+    for num_jobs, copies, deadline in [(8, 2, 12), (10, 3, 14), (12, 2, 16)]:
+        for workers in [1, None]:
+            options = js.SolverOptions(workers, args.time_limit,
+                                       random_seed=args.seed)
+            for symmetry_breaking in [False, True]:
+                order = generate_order(num_jobs, num_tasks=4, num_machines=3,
+                                       deadline=deadline, seed=args.seed,
+                                       machine_copies=copies,
+                                       name="%d jobs, %d copies"
+                                       %(num_jobs, copies))
+                order.create_model(7, symmetry_breaking=symmetry_breaking)
+                _, solver = order.solve(options)
+                stats = order.solve_stats(solver)
+                print("%-22s %8s %9s %10s %10s %10d %9.3f %10d"
+                      %(order.name, workers or "default",
+                        "on" if symmetry_breaking else "off", stats['status'],
+                        stats['objective'], stats['bound'],
+                        stats['wall_time'], stats['branches']))
+
+# Behaviors for the greenhouse benchmarks.  Spacing is between chunks, so
+#   at most one chunk per min_spacing can be on; the durations are short
+#   enough for the problem to be feasible at every resolution
+greenhouse_behaviors = {
+    "Light":      BehaviorInfo(8*60,     0,    0, 4*60),
+    "LowerHumid": BehaviorInfo(  30, 12*60,   30, 2*60),
+    "LowerTemp":  BehaviorInfo(  10, 12*60, 2*60, 4*60),
+    "RaiseTemp":  BehaviorInfo(  10, 12*60, 2*60, 4*60),
+    "LowerMoist": BehaviorInfo(  10, 12*60, 2*60, 4*60),
+    "RaiseMoist": BehaviorInfo(  10, 12*60, 2*60, 4*60),
+    "TakeImage":  BehaviorInfo(   3,     0, 3*60, 6*60)}
+
+# Time building and solving the GreenhouseScheduler model, and the
+#   interval-based model, at different resolutions
+def bench_greenhouse(args):
+    print("GreenhouseScheduler build and solve by resolution")
+    print("%8s %8s %12s %10s %10s %10s" %("minutes", "chunks", "constraints",
+                                          "build (s)", "solve (s)", "status"))
+    for minutes in [30, 15, 5, 1]:
+        problem, build = timed(GreenhouseScheduler, greenhouse_behaviors,
+                               minutes)
+        solution, solve = timed(problem.solveProblem)
+        print("%8d %8d %12d %10.3f %10.3f %10s"
+              %(minutes, problem.horizon,
+                len(problem.model.Proto().constraints), build, solve,
+                "feasible" if solution else "infeasible"))
+    print("GreenhouseIntervalScheduler (build includes the 30-minute hint)")
+    print("%8s %8s %12s %10s %10s %10s" %("minutes", "units", "constraints",
+                                          "build (s)", "solve (s)", "status"))
+    for minutes in [30, 15, 5, 1, 1/60]:
+        problem, build = timed(GreenhouseIntervalScheduler,
+                               greenhouse_behaviors, minutes,
+                               max_time_in_seconds=args.time_limit)
+        solution, solve = timed(problem.solveProblem)
+        print("%8.3g %8d %12d %10.3f %10.3f %10s"
+              %(minutes, problem.horizon,
+                len(problem.model.Proto().constraints), build, solve,
+                "feasible" if solution else "not found"))
+
+# Time ScheduleMonitor's default problem solved, and from the schedule cache
+def bench_schedule_cache(args):
+    dirname = tempfile.mkdtemp()
+    try:
+        cache = ScheduleCache(os.path.join(dirname, "cache"))
+        sched_file = os.path.join(dirname, "schedule.txt")
+        _, miss = timed(cache.solve, defaultBehaviorsInfo(), 30, sched_file)
+        _, hit = timed(cache.solve, defaultBehaviorsInfo(), 30, sched_file)
+        print("Schedule cache: miss (solve and store) %.4fs, hit %.4fs"
+              %(miss, hit))
+    finally:
+        shutil.rmtree(dirname)
+
+# The objective terms of a feasibility-only schedule: solve the weighted
+#   model with the jobs fixed to the schedule
+def greenhouse_terms(behaviors_info, minutes, chunk_times, weights):
+    problem = GreenhouseScheduler(behaviors_info, minutes, weights=weights)
+    for (behavior, t), job in problem.all_jobs.items():
+        problem.model.Add(job == int(t in chunk_times[behavior]))
+    problem.solveProblem()
+    return problem.objective_value
+
+# Compare feasibility-only schedules to ones minimizing the default
+#   ObjectiveWeights (energy, switching and Light during daylight)
+def bench_greenhouse_objective(args):
+    weights = ObjectiveWeights()
+    print("GreenhouseScheduler objective %s (time limit %gs)"
+          %(weights, args.time_limit))
+    print("%8s %12s %10s %12s %10s %10s" %("minutes", "feasible obj",
+                                           "solve (s)", "weighted obj",
+                                           "bound", "solve (s)"))
+    for minutes in [30, 15, 5]:
+        problem = GreenhouseScheduler(greenhouse_behaviors, minutes)
+        _, solve = timed(problem.solveProblem)
+        feasible = greenhouse_terms(greenhouse_behaviors, minutes,
+                                    problem.chunk_times, weights)
+        problem = GreenhouseScheduler(greenhouse_behaviors, minutes,
+                                      weights=weights,
+                                      max_time_in_seconds=args.time_limit)
+        _, weighted_solve = timed(problem.solveProblem)
+        print("%8d %12d %10.3f %12d %10d %10.3f"
+              %(minutes, feasible, solve, problem.objective_value,
+                problem.objective_bound, weighted_solve))
+
+# Compare solving N days of ScheduleMonitor's problem (with RaiseMoist moving
+#   to its 'med' preset half way through) one day at a time, as
+#   ScheduleMonitor does, to solving them in one MultiDayGreenhouseScheduler
+#   model (whose build includes the daily hints).  Also checks whether the
+#   daily schedules, put end to end, meet the spacing constraints at midnight
+def bench_greenhouse_multiday(args):
+    print("MultiDayGreenhouseScheduler vs daily GreenhouseScheduler solves")
+    print("%5s %10s %12s %10s %10s %10s" %("days", "daily (s)",
+                                           "daily valid", "build (s)",
+                                           "solve (s)", "status"))
+    for days in [1, 3, 7]:
+        overrides = {days//2: {"RaiseMoist": raiseMoistPresets['med']}}
+        start = time.perf_counter()
+        days_chunk_times = []
+        for day in range(days):
+            behaviors_info = defaultBehaviorsInfo()
+            for override_day in range(day + 1):
+                behaviors_info.update(overrides.get(override_day, {}))
+            problem = GreenhouseScheduler(behaviors_info, 30)
+            problem.solveProblem()
+            days_chunk_times.append(problem.chunk_times)
+        daily = time.perf_counter() - start
+
+        # Fix the daily schedules in the multi-day model
+        problem = MultiDayGreenhouseScheduler(defaultBehaviorsInfo(), days, 30,
+                                              overrides, hint_daily=False)
+        for day, chunk_times in enumerate(days_chunk_times):
+            for behavior, times in chunk_times.items():
+                for t, job in enumerate(problem.dayJobs(behavior, day)):
+                    problem.model.Add(job == int(t in times))
+        valid = problem.solveProblem() is not None
+
+        problem, build = timed(MultiDayGreenhouseScheduler,
+                               defaultBehaviorsInfo(), days, 30, overrides,
+                               max_time_in_seconds=args.time_limit)
+        solution, solve = timed(problem.solveProblem)
+        print("%5d %10.3f %12s %10.3f %10.3f %10s"
+              %(days, daily, valid, build, solve,
+                "feasible" if solution else "not found"))
+
+# For each infeasible combination of ScheduleMonitor's presets, time finding
+#   the minimal conflict, and solving with just the conflicting behaviors
+#   relaxed to their defaults
+def bench_greenhouse_explain(args):
+    print("GreenhouseScheduler infeasibility explanation (30 minute chunks)")
+    print("%-6s %-6s %10s %10s %10s  %s" %("Light", "Moist", "solve (s)",
+                                           "explain (s)", "relaxed (s)",
+                                           "conflict"))
+    for light in lightPresets:
+        for moist in raiseMoistPresets:
+            behaviors_info = defaultBehaviorsInfo()
+            behaviors_info["Light"] = lightPresets[light]
+            behaviors_info["RaiseMoist"] = raiseMoistPresets[moist]
+            problem = GreenhouseScheduler(behaviors_info, 30)
+            solution, solve = timed(problem.solveProblem)
+            if (solution is not None): continue
+            conflict, explain = timed(explainInfeasibility, behaviors_info, 30)
+            conflict = conflict or []
+            relaxed = relaxBehaviorsInfo(behaviors_info, conflict,
+                                         defaultBehaviorsInfo())
+            problem = GreenhouseScheduler(relaxed, 30)
+            solution, resolve = timed(problem.solveProblem)
+            print("%-6s %-6s %10.3f %10.3f %10.3f  %s%s"
+                  %(light, moist, solve, explain, resolve,
+                    sorted(set(behavior for family, behavior in conflict
+                               if family != 'mutex')),
+                    "" if solution else " (still infeasible)"))
+
+# ScheduleMonitor's nightly solve, without the plant measurement (which
+#   needs the camera images and vision models): the seedling presets, which
+#   are infeasible, so the conflict is explained and relaxed before resolving.
+#   Returns the schedule file, with no settings to apply (see
+#   ScheduleMonitor.plan)
+def midnight_plan(sched_file, minutes_per_chunk):
+    behaviors_info = defaultBehaviorsInfo()
+    behaviors_info["Light"] = lightPresets['med']
+    behaviors_info["RaiseMoist"] = raiseMoistPresets['med']
+    problem = GreenhouseScheduler(behaviors_info, minutes_per_chunk, sched_file)
+    if (problem.solveProblem() is None):
+        conflict = explainInfeasibility(behaviors_info, minutes_per_chunk)
+        behaviors_info = relaxBehaviorsInfo(behaviors_info, conflict or [],
+                                            defaultBehaviorsInfo())
+        GreenhouseScheduler(behaviors_info, minutes_per_chunk,
+                            sched_file).solveProblem()
+    return sched_file, None
+
+# Just enough of an agent for the PlanningLayer
+class PlanningAgent(object):
+    def __init__(self): self.executive = self
+    def getExecutiveLayer(self): return self.executive
+    def setSchedule(self, schedule): self.schedule = schedule
+
+# Step the PlanningLayer through midnight, one simulated second per period,
+#   planning the next day's schedule either in the control loop (as
+#   ScheduleMonitor did) or in the background.  Returns the longest step,
+#   and the number of steps until the new schedule was in use
+def planning_loop(asynchronous, sched_file, minutes_per_chunk, period=0.1):
+    planning = layers.PlanningLayer("greenhouse_schedule.txt", PlanningAgent())
+    longest, t = 0, 24*60*60 - 2
+    for step in range(1000):
+        start = time.perf_counter()
+        if (t == 0):
+            if (asynchronous):
+                planning.planInBackground(midnight_plan, sched_file,
+                                          minutes_per_chunk)
+            else:
+                planning.postSchedule(*midnight_plan(sched_file,
+                                                     minutes_per_chunk))
+        planning.doStep(t)
+        duration = time.perf_counter() - start
+        longest = max(longest, duration)
+        if (planning.usetestfile and not planning.schedulerequested): break
+        time.sleep(max(0, period - duration))
+        t = (t + 1) % (24*60*60)
+    return longest, step - 2
+
+# The control loop stall at midnight, with ScheduleMonitor's solve in the
+#   loop and in the PlanningLayer's worker thread
+def bench_planning_stall(args):
+    print("Midnight re-planning: longest control step, and steps (at 0.1s)"
+          " until the new schedule is used")
+    print("%8s %14s %8s %14s %8s" %("minutes", "in loop (s)", "steps",
+                                    "background (s)", "steps"))
+    dirname = tempfile.mkdtemp()
+    try:
+        sched_file = os.path.join(dirname, "schedule.txt")
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync = planning_loop(False, sched_file, 30)
+            background = planning_loop(True, sched_file, 30)
+        print("%8d %14.3f %8d %14.3f %8d" %((30,) + sync + background))
+    finally:
+        shutil.rmtree(dirname)
+
+# Stand-ins for the greenhouse behaviors and monitors (which need ROS), that
+#   look up the monitors and behaviors they use each step, as the real ones do
+class SimSensors(object):
+    def __init__(self): self.time = 0
+    def getTime(self): return self.time
+    def doSense(self): return {'unix_time': self.time}
+
+class SimBehavior(object):
+    def __init__(self, agent, name, monitors):
+        self.agent, self.name, self.monitors = agent, name, monitors
+    def setSensors(self, sensors): self.sensors = sensors
+    def setActuators(self, actuators): pass
+    def start(self): pass
+    def pause(self): pass
+    def doStep(self):
+        self.sensordata = self.sensors.doSense()
+        for name in self.monitors:
+            self.agent.getExecutiveLayer().getMonitor(name)
+
+class SimMonitor(object):
+    def __init__(self, name, behavior):
+        self.name, self.behavior, self.period = name, behavior, 1
+        self.last_time = 0
+    def setSensors(self, sensors): self.sensors = sensors
+    def setActuatorState(self, actuator_state): pass
+    def setExecutive(self, executive): self.executive = executive
+    def activate(self): pass
+    def doMonitor(self):
+        self.executive.agent.getBehavioralLayer().getBehavior(self.behavior)
+
+class SimAgent(object):
+    def __init__(self):
+        self.sensors = SimSensors()
+        uses = {"LightBehavior": ["LightMonitor"],
+                "LowerHumidBehavior": [], "LowerMoistBehavior": [],
+                "LowerTempBehavior": [],
+                "RaiseMoistBehavior": ["LoggingMonitor", "ScheduleMonitor"],
+                "RaiseTempBehavior": [], "TakeImageBehavior": [],
+                "EmailBehavior": ["LightMonitor", "LoggingMonitor"]}
+        self.behavioral = layers.BehavioralLayer(
+            self.sensors, None, [SimBehavior(self, name, monitors)
+                                 for name, monitors in uses.items()], self)
+        self.executive = layers.ExecutiveLayer(self)
+        self.planning = layers.PlanningLayer("greenhouse_schedule.txt", self)
+        self.planning.getNewSchedule()
+        self.executive.setMonitors(
+            self.sensors, None,
+            [SimMonitor("LightMonitor", "LightBehavior"),
+             SimMonitor("LoggingMonitor", "RaiseMoistBehavior"),
+             SimMonitor("ScheduleMonitor", "TakeImageBehavior")])
+    def getBehavioralLayer(self): return self.behavioral
+    def getExecutiveLayer(self): return self.executive
+    def getPlanningLayer(self): return self.planning
+
+def simulate_hour():
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent = SimAgent()
+    start = time.perf_counter()
+    for t in range(int(7.5*3600), int(8.5*3600)):
+        agent.sensors.time = t
+        agent.getPlanningLayer().doStep(t)
+        agent.getExecutiveLayer().doStep(t)
+        agent.getBehavioralLayer().doStep()
+    return time.perf_counter() - start
+
+# Time the agent's control loop (all three layers) for an hour of simulated
+#   seconds, from 7:30am, through the morning's schedule changes (best of 5)
+def bench_layers(args):
+    elapsed = min(simulate_hour() for _ in range(5))
+    print("Layers: 1 hour simulated (3600 steps) in %.4fs, %.1fus per step"
+          %(elapsed, elapsed/3600*1e6))
+
+benchmarks = {'create_model': bench_create_model,
+              'warm_start': bench_warm_start,
+              'lns': bench_lns,
+              'presolve': bench_presolve,
+              'parse': bench_parse,
+              'cache': bench_cache,
+              'scaling': bench_scaling,
+              'model_io': bench_model_io,
+              'verify': bench_verify,
+              'tools_cumulative': bench_tools_cumulative,
+              'unused_parts': bench_unused_parts,
+              'symmetry': bench_symmetry,
+              'greenhouse': bench_greenhouse,
+              'schedule_cache': bench_schedule_cache,
+              'greenhouse_objective': bench_greenhouse_objective,
+              'greenhouse_multiday': bench_greenhouse_multiday,
+              'greenhouse_explain': bench_greenhouse_explain,
+              'planning_stall': bench_planning_stall,
+              'layers': bench_layers}
+
+def main():
+    args = parser.parse_args()
+    if (not args.benchmark):
+        names = list(benchmarks)
+    elif (args.benchmark == '?'):
+        print("Valid benchmarks are %s" %list(benchmarks)); return
+    else:
+        names = args.benchmark.replace(",", " ").split(" ")
+        for name in names:
+            if (not name in benchmarks):
+                print("%s is not a valid benchmark" %name)
+                print("Valid benchmarks are %s" %list(benchmarks)); return
+    for name in names:
+        benchmarks[name](args)
+        print('')
+
+if __name__ == '__main__':
+    main()
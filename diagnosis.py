@@ -1,5 +1,6 @@
 from cnf import *
 from ortools.sat.python import cp_model
+import solver_telemetry
 
 objects = ['Outlet', 'Rasp-Pi', 'Power-Board',
            'Arduino', 'Sensor-Board0', 'Sensor-Board1']
@@ -278,7 +279,8 @@ def diagnose(observations):
     collector = DiagnosesCollector(variables)
     diagnoses = []
     solver = cp_model.CpSolver()
-    solver.SearchForAllSolutions(model, collector)
+    solver.parameters.enumerate_all_solutions = True
+    solver_telemetry.solve(solver, model, "diagnosis.diagnose", collector)
     # Remove all redundant diagnoses (those that are supersets
     #   of other diagnoses).
     # BEGIN STUDENT CODE
@@ -155,11 +155,11 @@ class Email(Greenhouse_Behavior):
         return health_msg
     
     def get_previous_insolation(self):
-        lightMonitor = self.agent.getExecutiveLayer().getMonitor('LightMonitor')
+        lightMonitor = self.getMonitor('LightMonitor')
         return lightMonitor.getPrevInsolation()
     
     def get_water_weight_info(self):
-        loggingMonitor = self.agent.getExecutiveLayer().getMonitor('LoggingMonitor')
+        loggingMonitor = self.getMonitor('LoggingMonitor')
         total_water, contributed_weight, succ, fail_count, tries = loggingMonitor.getWaterWeightData(self.time)
         
         watered_enough_count = fail_count[0]
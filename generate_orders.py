@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# Generate random orders, for testing how the JobScheduler scales.
+# The orders can be written to a file in the format read by parse_orders
+import random
+import job_scheduler as js
+from parse_orders import write_orders
+
+# Create a JobScheduler with num_jobs random jobs, each a sequence of
+#   tasks_per_job tasks drawn from a pool of num_tasks tasks.  Each task can
+#   be done on 1-3 of the num_machines machines.
+# If num_tools > 0, each task uses up to 2 of the tools, and each tool has a
+#   pool of tool_pool[0] to tool_pool[1] instances.
+# If num_parts > 0, each task uses up to 2 of the parts, each part starts
+#   with part_count[0] to part_count[1] in stock, and num_parts_tasks
+#   production tasks (each a job of its own) make more parts.
+# Each machine has machine_copies - 1 identical copies (same energy cost,
+#   and same durations and values for each task), for testing symmetry
+#   breaking
+# deadline defaults to 5 hours for each task of each job
+def generate_order(num_jobs, tasks_per_job=3, num_tasks=10, num_machines=11,
+                   num_tools=0, tool_pool=(1, 3), num_parts=0,
+                   part_count=(2, 5), num_parts_tasks=0, deadline=None,
+                   name=None, seed=0, machine_copies=1):
+    rand = random.Random(seed)
+    machines = [js.Machine("M%d" %(i+1), rand.randint(40, 60))
+                for i in range(num_machines)]
+    copies = {machine.name: [js.Machine("%s_%d" %(machine.name, copy+1),
+                                        machine.energy_cost)
+                             for copy in range(1, machine_copies)]
+              for machine in machines}
+    tools = [js.Tool("Tool%d" %(i+1), rand.randint(*tool_pool))
+             for i in range(num_tools)]
+    parts = [js.Part("Part%d" %(i+1), rand.randint(*part_count),
+                     rand.randint(5, 50))
+             for i in range(num_parts)]
+
+    def add_task_machines(task, values):
+        task_machines = []
+        for machine in rand.sample(machines, rand.randint(1, 3)):
+            duration, value = rand.randint(1, 5), 50*rand.randint(*values)
+            for copy in [machine] + copies[machine.name]:
+                task_machines.append(js.TaskMachine(task, copy, duration,
+                                                    value))
+        task.addTaskMachineList(task_machines)
+    tasks = []
+    for i in range(num_tasks):
+        task_tools = (rand.sample(tools, rand.randint(0, min(2, num_tools)))
+                      if tools else [])
+        task_parts = (rand.sample(parts, rand.randint(0, min(2, num_parts)))
+                      if parts else [])
+        task = js.Task("T%d" %(i+1), task_tools, task_parts)
+        add_task_machines(task, (2, 10))
+        tasks.append(task)
+    jobs = [js.Job("J%d" %(i+1), rand.sample(tasks, tasks_per_job))
+            for i in range(num_jobs)]
+
+    for i in range(num_parts_tasks if parts else 0):
+        task = js.PartsTask("T_part%d" %(i+1), rand.choice(parts),
+                            rand.randint(1, 3))
+        add_task_machines(task, (0, 0))
+        tasks.append(task)
+        jobs.append(js.Job("J_part%d" %(i+1), [task]))
+
+    if deadline is None: deadline = 5*num_jobs*tasks_per_job
+    use_parts = len(tools) > 0 or len(parts) > 0
+    machines = [copy for machine in machines
+                for copy in [machine] + copies[machine.name]]
+    return js.JobScheduler(name or "synthetic-%d" %num_jobs, deadline, jobs,
+                           tasks, machines, parts, tools, True, use_parts)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', help='The order file to write')
+    parser.add_argument('-n', '--name', default=None,
+                        help='The name of the order')
+    parser.add_argument('-j', '--jobs', default=10, type=int,
+                        help="Number of jobs in the order")
+    parser.add_argument('--tasks-per-job', default=3, type=int)
+    parser.add_argument('--tasks', default=10, type=int,
+                        help='Number of tasks to draw the jobs from')
+    parser.add_argument('--machines', default=11, type=int)
+    parser.add_argument('--tools', default=0, type=int)
+    parser.add_argument('--tool-pool', default=[1, 3], type=int, nargs=2,
+                        help='Range of the number of instances of each tool')
+    parser.add_argument('--parts', default=0, type=int)
+    parser.add_argument('--part-count', default=[2, 5], type=int, nargs=2,
+                        help='Range of the initial number of each part')
+    parser.add_argument('--parts-tasks', default=0, type=int,
+                        help='Number of tasks that produce parts')
+    parser.add_argument('--deadline', default=None, type=int)
+    parser.add_argument('--arrive-by', default=None, type=int,
+                        help='Give each job a random arrival time up to this, '
+                        'for replaying with online_scheduler')
+    parser.add_argument('--machine-copies', default=1, type=int,
+                        help='Number of identical copies of each machine')
+    parser.add_argument('--seed', default=0, type=int)
+    args = parser.parse_args()
+
+    order = generate_order(args.jobs, args.tasks_per_job, args.tasks,
+                           args.machines, args.tools, args.tool_pool,
+                           args.parts, args.part_count, args.parts_tasks,
+                           args.deadline, args.name, args.seed,
+                           args.machine_copies)
+    arrivals = None
+    if (args.arrive_by is not None):
+        rand = random.Random(args.seed)
+        arrivals = {job.name: rand.randint(1, args.arrive_by)
+                    for job in order.jobs}
+    write_orders(args.filename, [order], arrivals)
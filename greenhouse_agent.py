@@ -1,6 +1,6 @@
 import rclpy, rclpy.node
 import ros_hardware, layers
-import sys, select
+import sys, select, time
 from terrabot_utils import time_since_midnight, set_use_sim_time, spin_for, get_ros_time
 from terrabot_utils import clock_time
 import greenhouse_behaviors as gb
@@ -131,14 +131,22 @@ class LayeredGreenhouseAgent(GreenhouseAgent):
     def getPlanningLayer(self):
         return self.planning
 
+    # Report control steps that take longer than the 1 second loop period
+    stall_threshold = 1.0
+
     def main(self):
         self.wait_for_sensors(self.sensors)
         while rclpy.ok():
             t = time_since_midnight(get_ros_time(self))
             # Run a step of each layer of the architecture
+            start = time.perf_counter()
             self.getPlanningLayer().doStep(t)
             self.getExecutiveLayer().doStep(t)
             self.getBehavioralLayer().doStep()
+            stall = time.perf_counter() - start
+            if (stall > self.stall_threshold):
+                print("STALL: control step at %02d:%02d took %.2fs"
+                      %(t//3600, (t%3600)//60, stall))
             spin_for(self, 1)
             check_for_input()
 
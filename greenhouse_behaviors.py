@@ -11,10 +11,21 @@ from transitions import Machine
 class Greenhouse_Behavior(Behavior):
     def __init__(self, agent, name):
         super(Greenhouse_Behavior, self).__init__(agent, name)    
+        self.agent = agent
+        self.monitorHandles = {}
         
     def enable(self):  self.trigger('enable')
     def disable(self): self.trigger('disable')
 
+    # The executive's monitor with the given name, looked up the first time
+    #   it is used (the monitors are set once, when the agent starts)
+    def getMonitor(self, name):
+        monitor = self.monitorHandles.get(name)
+        if (monitor is None):
+            monitor = self.agent.getExecutiveLayer().getMonitor(name)
+            if (monitor is not None): self.monitorHandles[name] = monitor
+        return monitor
+
 '''
 The combined ambient and LED light level between 8am and 10pm should be 
 in the optimal['light_level'] range;
@@ -117,7 +128,7 @@ class Light(Greenhouse_Behavior):
         self.setLED(0)
     
     def adjust_optimal_level(self):
-        monitor = self.agent.getExecutiveLayer().getMonitor('LightMonitor')
+        monitor = self.getMonitor('LightMonitor')
         
         # Avoid over-insolation
         new_optimal_level = [(monitor.current_optimal // 1) - 45, (monitor.current_optimal // 1) + 5]
@@ -415,7 +426,7 @@ class RaiseSMoist(Greenhouse_Behavior):
 
     def cant_water(self):
         w, r, m = self.watered_enough(), self.reservoir_empty(), self.moist_enough()
-        loggingMonitor = self.agent.getExecutiveLayer().getMonitor('LoggingMonitor')
+        loggingMonitor = self.getMonitor('LoggingMonitor')
         loggingMonitor.logWaterAttempts(self.time, w, r, m)
         return w or r or m
         
@@ -476,7 +487,7 @@ class RaiseSMoist(Greenhouse_Behavior):
 
         self.total_water += dwater
 
-        loggingMonitor = self.agent.getExecutiveLayer().getMonitor('LoggingMonitor')
+        loggingMonitor = self.getMonitor('LoggingMonitor')
         loggingMonitor.logWaterData(self.time, dwater)
 
         print("calcWaterAdded: %.1f (%.1f = %.1f - %.1f)"
@@ -510,7 +521,7 @@ class RaiseSMoist(Greenhouse_Behavior):
                                   {"wpump": state}))
     
     def updateDailyLimit(self):
-        scheduleMonitor = self.agent.getExecutiveLayer().getMonitor('ScheduleMonitor')
+        scheduleMonitor = self.getMonitor('ScheduleMonitor')
         new_limit = scheduleMonitor.getDailyWaterLimit()
         print(f"Daily watering limit updated from {self.daily_limit} mL to {new_limit} mL.")
         self.daily_limit = new_limit
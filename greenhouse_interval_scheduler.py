@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# An interval-based alternative to GreenhouseScheduler.
+# Instead of one Boolean per behavior per chunk, each behavior is a small
+#   number of optional interval variables (its instances), each with a start
+#   and length in time units of minutes_per_unit (which can be less than a
+#   minute).  The model size depends on the number of behaviors and
+#   instances, not on the resolution.
+# The constraints follow GreenhouseScheduler's, for runs of time rather
+#   than chunks:
+#   1. Duration: the instances of each behavior add up to at least min_extent
+#   2. Mutex: the instances of exclusive behaviors do not overlap (one
+#      NoOverlap per clique of exclusive behaviors)
+#   3. Night: the parts of the instances within [20,24) U [0,8) add up to at
+#      most night_extent, and behaviors with no night_extent only run during
+#      the day
+#   4. Spacing: between consecutive instances the behavior is off for at
+#      least min_spacing and less than max_spacing, and it is not off for
+#      max_spacing at the start or end of the day (of 8am-8pm, if it has no
+#      night_extent)
+# Unlike in GreenhouseScheduler, an instance can run for longer than one
+#   chunk, so any GreenhouseScheduler schedule (with its consecutive chunks
+#   merged) satisfies these constraints, but not vice versa.  CP-SAT finds it
+#   hard to place the instances from scratch at fine resolutions, so by
+#   default the (small) 30-minute GreenhouseScheduler model is solved first
+#   and its schedule is used as a hint
+from ortools.sat.python import cp_model
+import schedule as sched
+import solver_telemetry
+from greenhouse_scheduler import BehaviorInfo, GreenhouseScheduler, \
+     mutexCliques
+
+class GreenhouseIntervalScheduler:
+
+    # behaviors_info, sched_file, max_constraint: as for GreenhouseScheduler
+    # minutes_per_unit: the time resolution of the starts and ends of the
+    #   instances (e.g., 1/60 for seconds)
+    # max_instances: the number of instances of each behavior beyond those
+    #   needed for its max_spacing (see numInstances)
+    # hint_minutes_per_chunk: hint the schedule of the GreenhouseScheduler
+    #   with chunks of this many minutes (no hint if None, or if that model is
+    #   infeasible)
+    def __init__(self, behaviors_info, minutes_per_unit=1, sched_file=None,
+                 max_constraint=4, max_instances=4, hint_minutes_per_chunk=30,
+                 num_workers=None, max_time_in_seconds=None):
+        self.behaviors_info = behaviors_info
+        self.minutes_per_unit = minutes_per_unit
+        self.horizon = self.toUnits(24*60)
+        self.sched_file = sched_file
+        self.max_instances = max_instances
+        self.num_workers = num_workers
+        self.max_time_in_seconds = max_time_in_seconds
+        self.createModel(max_constraint)
+        if (hint_minutes_per_chunk is not None):
+            self.addChunkHints(hint_minutes_per_chunk, max_constraint)
+
+    def toUnits(self, minutes):
+        return int(round(minutes/self.minutes_per_unit))
+
+    def toMinutes(self, units):
+        minutes = round(units*self.minutes_per_unit, 6)
+        return int(minutes) if minutes == int(minutes) else minutes
+
+    # Enough instances for the behavior to run at least every max_spacing
+    #   (with max_instances to spare), but no more than fit in the day with
+    #   min_spacing between them
+    def numInstances(self, behavior):
+        info = self.behaviors_info[behavior]
+        window = 24*60 if info.night_extent > 0 else 12*60
+        instances = self.max_instances + window//max(info.max_spacing, 1)
+        if (info.min_spacing > 0):
+            instances = min(instances, 24*60//info.min_spacing + 1)
+        return instances
+
+    # For each behavior, lists of the presence literal, start, length and end
+    #   of each instance, and its (optional) interval.  The present instances
+    #   come first, in time order; absent ones are empty and at the horizon
+    def createVariables(self):
+        model = self.model
+        self.presents, self.starts, self.lengths = {}, {}, {}
+        self.ends, self.intervals = {}, {}
+        for behavior in self.behaviors_info:
+            presents, starts, lengths, ends, intervals = [], [], [], [], []
+            for i in range(self.numInstances(behavior)):
+                suffix = '%s_%i' % (behavior, i)
+                present = model.NewBoolVar('present_' + suffix)
+                start = model.NewIntVar(0, self.horizon, 'start_' + suffix)
+                length = model.NewIntVar(0, self.horizon, 'length_' + suffix)
+                end = model.NewIntVar(0, self.horizon, 'end_' + suffix)
+                intervals.append(model.NewOptionalIntervalVar(
+                    start, length, end, present, 'interval_' + suffix))
+                model.Add(length >= 1).OnlyEnforceIf(present)
+                model.Add(start == self.horizon).OnlyEnforceIf(present.Not())
+                model.Add(length == 0).OnlyEnforceIf(present.Not())
+                model.Add(end == self.horizon).OnlyEnforceIf(present.Not())
+                if (presents):
+                    model.AddImplication(present, presents[-1])
+                    model.Add(ends[-1] <= start).OnlyEnforceIf(present)
+                presents.append(present); starts.append(start)
+                lengths.append(length); ends.append(end)
+            self.presents[behavior], self.starts[behavior] = presents, starts
+            self.lengths[behavior], self.ends[behavior] = lengths, ends
+            self.intervals[behavior] = intervals
+
+    def createModel(self, max_constraint=4):
+        self.model = cp_model.CpModel()
+        self.createVariables()
+        if (max_constraint >= 1): self.createDurationConstraints(self.model)
+        if (max_constraint >= 2): self.createMutualExclusiveConstraints(self.model)
+        if (max_constraint >= 3): self.createNightConstraints(self.model)
+        if (max_constraint >= 4): self.createSpacingConstraints(self.model)
+
+    def solveProblem(self, visualize=False, verbose=False):
+        return self.solve(self.model, visualize, verbose)
+
+    def createDurationConstraints(self, model):
+        for behavior in self.behaviors_info:
+            duration = self.toUnits(self.behaviors_info[behavior].min_extent)
+            model.Add(cp_model.LinearExpr.Sum(self.lengths[behavior])
+                      >= duration)
+
+    def createMutualExclusiveConstraints(self, model):
+        for clique in mutexCliques(self.behaviors_info):
+            model.AddNoOverlap([interval for behavior in clique
+                                for interval in self.intervals[behavior]])
+
+    # Each instance's time at night is its overlap with [0, 8am) plus its
+    #   overlap with [8pm, midnight)
+    def createNightConstraints(self, model):
+        morning, evening = self.toUnits(8*60), self.toUnits(20*60)
+        for behavior in self.behaviors_info:
+            max_night = self.toUnits(self.behaviors_info[behavior].night_extent)
+            presents = self.presents[behavior]
+            starts, ends = self.starts[behavior], self.ends[behavior]
+            if (max_night == 0):
+                for present, start, end in zip(presents, starts, ends):
+                    model.Add(start >= morning).OnlyEnforceIf(present)
+                    model.Add(end <= evening).OnlyEnforceIf(present)
+                continue
+            night_times = []
+            for start, end in zip(starts, ends):
+                clipped = []
+                for time in [start, end]:
+                    early = model.NewIntVar(0, morning, '')
+                    model.AddMinEquality(early, [time, morning])
+                    late = model.NewIntVar(evening, self.horizon, '')
+                    model.AddMaxEquality(late, [time, evening])
+                    clipped.append((early, late))
+                (start_early, start_late), (end_early, end_late) = clipped
+                night_times += [end_early - start_early, end_late - start_late]
+            model.Add(sum(night_times) <= max_night)
+
+    def createSpacingConstraints(self, model):
+        for behavior in self.behaviors_info:
+            info = self.behaviors_info[behavior]
+            min_gap = self.toUnits(info.min_spacing)
+            max_gap = self.toUnits(info.max_spacing)
+            night = (info.night_extent > 0)
+            first = 0 if night else self.toUnits(8*60)
+            last = self.horizon if night else self.toUnits(20*60)
+            presents = self.presents[behavior]
+            starts, ends = self.starts[behavior], self.ends[behavior]
+
+            for i in range(1, len(presents)):
+                model.Add(starts[i] - ends[i-1] >= min_gap).OnlyEnforceIf(
+                    presents[i])
+                model.Add(starts[i] - ends[i-1] < max_gap).OnlyEnforceIf(
+                    presents[i])
+            # As in GreenhouseScheduler, if the window is shorter than
+            #   max_spacing, the behavior need not run at all
+            if (last - first < max_gap): continue
+            model.Add(presents[0] == True)
+            model.Add(starts[0] - first < max_gap)
+            for i in range(len(presents)):
+                is_last = ([presents[i]] if i+1 == len(presents) else
+                           [presents[i], presents[i+1].Not()])
+                model.Add(last - ends[i] < max_gap).OnlyEnforceIf(is_last)
+
+    # Solve the GreenhouseScheduler model and hint its schedule, with each run
+    #   of consecutive chunks as an instance
+    def addChunkHints(self, minutes_per_chunk, max_constraint):
+        chunks = GreenhouseScheduler(self.behaviors_info, minutes_per_chunk,
+                                     max_constraint=max_constraint)
+        solver = cp_model.CpSolver()
+        status = solver_telemetry.solve(
+            solver, chunks.model, "GreenhouseIntervalScheduler.hint",
+            minutes_per_chunk=minutes_per_chunk,
+            behaviors=len(self.behaviors_info))
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE): return False
+        model = self.model
+        for behavior in self.behaviors_info:
+            runs = []
+            for t in range(chunks.horizon):
+                if (not solver.Value(chunks.all_jobs[behavior, t])): continue
+                start = self.toUnits(t*minutes_per_chunk)
+                end = self.toUnits((t+1)*minutes_per_chunk)
+                if (runs and runs[-1][1] == start): runs[-1] = (runs[-1][0], end)
+                else: runs.append((start, end))
+            presents, starts = self.presents[behavior], self.starts[behavior]
+            lengths, ends = self.lengths[behavior], self.ends[behavior]
+            for i in range(len(presents)):
+                start, end = (runs[i] if i < len(runs) else
+                              (self.horizon, self.horizon))
+                model.AddHint(presents[i], i < len(runs))
+                model.AddHint(starts[i], start)
+                model.AddHint(lengths[i], end - start)
+                model.AddHint(ends[i], end)
+        return True
+
+    # The schedule found by the solver: {behavior: [(start, end)]}, in minutes
+    def extractSchedule(self, solver):
+        schedule = {}
+        for behavior in self.behaviors_info:
+            schedule[behavior] = [
+                (self.toMinutes(solver.Value(start)),
+                 self.toMinutes(solver.Value(end)))
+                for present, start, end in zip(self.presents[behavior],
+                                               self.starts[behavior],
+                                               self.ends[behavior])
+                if solver.Value(present)]
+        return schedule
+
+    # Solve the model.  Returns the schedule, or None if it is infeasible,
+    #   and writes the schedule to sched_file (if given) in the same format
+    #   as GreenhouseScheduler
+    def solve(self, model, visualize, verbose):
+        solver = cp_model.CpSolver()
+        if (self.num_workers is not None):
+            solver.parameters.num_workers = self.num_workers
+        if (self.max_time_in_seconds is not None):
+            solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        status = solver_telemetry.solve(
+            solver, model, "GreenhouseIntervalScheduler.solve",
+            minutes_per_unit=self.minutes_per_unit,
+            behaviors=len(self.behaviors_info))
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if verbose: print(solver.StatusName(status).lower())
+            return None
+
+        if verbose: print("feasible")
+        schedule = self.extractSchedule(solver)
+        if verbose:
+            for behavior, times in schedule.items():
+                print("Behavior:", behavior)
+                print("  Times: " + " ".join(["%s-%s" %(sched.mins_to_HHMM(s),
+                                                        sched.mins_to_HHMM(e))
+                                              for s, e in times]))
+        file_schedule = {behavior + "Behavior": times
+                         for behavior, times in schedule.items()}
+        if self.sched_file != None:
+            sched.writeSchedule(self.sched_file, file_schedule)
+        if visualize:
+            sched.displaySchedule(file_schedule)
+        return schedule
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--minutes-per-unit', default=1, type=float,
+                        help='Time resolution, in minutes (e.g., 0.25)')
+    parser.add_argument('-c', '--max-constraint', default=4, type=int)
+    parser.add_argument('-o', '--output', default="main_schedule.txt",
+                        help='The schedule file to write')
+    args = parser.parse_args()
+
+    behaviors_info = {}
+    behaviors_info["Light"] =      BehaviorInfo(8*60,     0,    0, 4*60)
+    behaviors_info["LowerHumid"] = BehaviorInfo(8*60, 12*60,   30, 2*60)
+    behaviors_info["LowerTemp"] =  BehaviorInfo(4*60, 12*60, 2*60, 4*60)
+    behaviors_info["RaiseTemp"] =  BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    behaviors_info["LowerMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    behaviors_info["RaiseMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    behaviors_info["TakeImage"] =  BehaviorInfo(1*60, 0,     3*60, 6*60)
+
+    problem = GreenhouseIntervalScheduler(behaviors_info,
+                                          args.minutes_per_unit, args.output,
+                                          args.max_constraint)
+    problem.solveProblem(verbose=True)
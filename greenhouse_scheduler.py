@@ -1,6 +1,8 @@
 # Import Python wrapper for or-tools CP-SAT solver.
 from ortools.sat.python import cp_model
 import visualize_solution
+import solver_telemetry
+import schedule
 
 class BehaviorInfo:
     def __init__(self, min_extent, night_extent, min_spacing, max_spacing):
@@ -12,6 +14,111 @@ class BehaviorInfo:
     def __repr__(self):
         return f"<{self.min_extent}, {self.night_extent}, {self.min_spacing}, {self.max_spacing}>"
 
+# Which actuators each behavior needs on (True) or off (False), or doesn't
+#   care about (None)
+behaviorActuators = {
+                #  Fan,   Light, Wpump
+    "LowerTemp":  (True,  False, None),
+    "RaiseTemp":  (False, True,  None),
+    "LowerHumid": (True,  None,  False),
+    "LowerMoist": (True,  None,  False),
+    "RaiseMoist": (False, None,  True),
+    "Light":      (None,  True,  None),
+    "TakeImage":  (None,  True,  None)
+}
+
+# The names of the actuators in behaviorActuators
+actuatorNames = ("fan", "led", "wpump")
+
+# Behaviors that raise and lower the same value
+simpleMutexes = [('LowerTemp', 'RaiseTemp'),
+                 ('LowerMoist', 'RaiseMoist'),
+                 ('RaiseMoist', 'LowerHumid')]
+
+# The (sorted) pairs of behaviors that cannot run at the same time: those in
+#   simpleMutexes, and those that both need an actuator on, or where one
+#   needs it on and the other off
+def mutexPairs():
+    pairs = set(tuple(sorted(pair)) for pair in simpleMutexes)
+    for actuator in range(3):
+        on = [b for b, acts in behaviorActuators.items() if acts[actuator] == True]
+        off = [b for b, acts in behaviorActuators.items() if acts[actuator] == False]
+        for behavior1 in on:
+            for behavior2 in on + off:
+                if (behavior1 != behavior2):
+                    pairs.add(tuple(sorted((behavior1, behavior2))))
+    return pairs
+
+allMutexPairs = mutexPairs()
+
+# Cover the mutex pairs among the given behaviors with cliques (sets of
+#   behaviors that are all pairwise exclusive), found greedily, so that each
+#   clique can be a single at-most-one constraint
+def mutexCliques(behaviors):
+    behaviors = sorted(behaviors)
+    pairs = set(pair for pair in allMutexPairs
+                if pair[0] in behaviors and pair[1] in behaviors)
+    cliques = []
+    while (pairs):
+        clique = list(min(pairs))
+        for behavior in behaviors:
+            if (not behavior in clique and
+                all(tuple(sorted((behavior, other))) in allMutexPairs
+                    for other in clique)):
+                clique.append(behavior)
+        cliques.append(sorted(clique))
+        pairs -= set(tuple(sorted((behavior1, behavior2)))
+                     for behavior1 in clique for behavior2 in clique
+                     if behavior1 < behavior2)
+    return cliques
+
+# The weights of the objective that GreenhouseScheduler minimizes, if given:
+#   on_chunks: per chunk that each actuator is on, times the actuator's
+#      energy weight in actuators (by default, the LEDs use the most energy
+#      and the pump uses water)
+#   switches: per time a behavior switches on or off
+#   ambient_light: per chunk that Light runs, times the expected ambient
+#      light (in units of 100) during the chunk, read from ambient_file
+class ObjectiveWeights:
+    def __init__(self, on_chunks=1, switches=1, ambient_light=1,
+                 actuators=None, ambient_file="grader_files/ambient.log"):
+        self.on_chunks = on_chunks
+        self.switches = switches
+        self.ambient_light = ambient_light
+        self.actuators = (actuators if actuators is not None else
+                          {"fan": 1, "led": 3, "wpump": 2})
+        self.ambient_file = ambient_file
+
+    def __repr__(self):
+        return (f"<on {self.on_chunks} {self.actuators}, switches "
+                f"{self.switches}, ambient {self.ambient_light}>")
+
+# Read a log of (seconds since midnight, light level) lines
+def readAmbient(filename):
+    ambient_data = []
+    with open(filename) as log_file:
+        for line in log_file:
+            if (line.strip()):
+                time, level = line.split()
+                ambient_data.append((float(time), float(level)))
+    return ambient_data
+
+# The mean ambient light during each chunk of the day, interpolating
+#   linearly between the readings
+def chunkAmbient(ambient_data, minutes_per_chunk):
+    means = []
+    chunk_secs = minutes_per_chunk*60
+    for start in range(0, 24*60*60, chunk_secs):
+        end = start + chunk_secs
+        total = 0
+        for (t1, v1), (t2, v2) in zip(ambient_data, ambient_data[1:]):
+            lo, hi = max(start, t1), min(end, t2)
+            if (lo >= hi): continue
+            level = lambda t: v1 + (v2 - v1)*(t - t1)/(t2 - t1)
+            total += (level(lo) + level(hi))/2*(hi - lo)
+        means.append(total/chunk_secs)
+    return means
+
 class GreenhouseScheduler:
 
     # The GreenhouseScheduler class takes the following parameters:
@@ -25,14 +132,29 @@ class GreenhouseScheduler:
     #    max_spacing: the maximum amount of time between two instances of the behavior
     # minutes_per_chunk: the number of minutes in each time block of the schedule
     # sched_file: the name of the file the schedule is to be written to, if not None
+    # weights: if not None, an ObjectiveWeights, and the schedule minimizes
+    #    the weighted objective, rather than being any feasible schedule
+    # max_time_in_seconds: time limit for the solve (with an objective, the
+    #    best schedule found is used)
+    # explain: if True, each family of constraints (the duration, night and
+    #    spacing constraints of each behavior, and each set of mutually
+    #    exclusive behaviors) is guarded by an assumption literal, and if the
+    #    problem is proven infeasible (within the time limit; see
+    #    explainInfeasibility), self.conflict is a minimal list of families
+    #    that are infeasible together, as (family, behavior) pairs, where
+    #    family is 'duration', 'night', 'spacing' or 'mutex' (for which
+    #    behavior is a tuple of the exclusive behaviors)
 
     def __init__(self, behaviors_info, minutes_per_chunk, sched_file=None,
-                 max_constraint=4):
+                 max_constraint=4, weights=None, max_time_in_seconds=None,
+                 explain=False):
         self.behaviors_info = behaviors_info
         self.minutes_per_chunk = minutes_per_chunk #all are the same length
         self.horizon = 24*60//self.minutes_per_chunk
         self.sched_file = sched_file
-        self.createModel(max_constraint)
+        self.max_time_in_seconds = max_time_in_seconds
+        self.explain = explain
+        self.createModel(max_constraint, weights)
 
     def createVariables (self):
         # Create behavior/time dictionary mapping to binary variables.
@@ -43,14 +165,32 @@ class GreenhouseScheduler:
                 # Boolean variable for whether behavior is enabled at that time
                 self.all_jobs[behavior,time] = self.model.NewBoolVar(suffix)
 
-    def createModel (self, max_constraint=4):
+    # The behavior's variables, in time order
+    def behaviorJobs(self, behavior):
+        return [self.all_jobs[behavior, t] for t in range(self.horizon)]
+
+    def createModel (self, max_constraint=4, weights=None):
         # Create the model.
         self.model = cp_model.CpModel()
         self.createVariables()
+        self.assumptions = {}
+        self.conflict = None
         if (max_constraint >= 1): self.createDurationConstraints(self.model)
         if (max_constraint >= 2): self.createMutualExclusiveConstraints(self.model)
         if (max_constraint >= 3): self.createNightConstraints(self.model)
         if (max_constraint >= 4): self.createSpacingConstraints(self.model)
+        self.objective_terms = None
+        if (weights is not None): self.createObjective(self.model, weights)
+        self.model.AddAssumptions(list(self.assumptions.values()))
+
+    # The enforcement literals for a family of constraints: none, unless
+    #   explaining infeasibility, in which case the family's assumption
+    def guard(self, family, behavior):
+        if (not self.explain): return []
+        if (not (family, behavior) in self.assumptions):
+            self.assumptions[family, behavior] = self.model.NewBoolVar(
+                'assume_%s_%s' %(family, behavior))
+        return [self.assumptions[family, behavior]]
 
     # This is the function to call to test the problem being solved.
     # It takes the requirements from the class constructor
@@ -65,8 +205,9 @@ class GreenhouseScheduler:
             duration = self.behaviors_info[behavior].min_extent # in minutes
             # BEGIN STUDENT CODE
             required_chunks = duration // self.minutes_per_chunk
-            curr_chunks = sum(self.all_jobs[behavior, t] for t in range(self.horizon))
-            model.Add(curr_chunks >= required_chunks)
+            model.Add(cp_model.LinearExpr.Sum(self.behaviorJobs(behavior))
+                      >= required_chunks).OnlyEnforceIf(
+                          self.guard('duration', behavior))
             # END STUDENT CODE
             pass
 
@@ -87,73 +228,17 @@ class GreenhouseScheduler:
     #      Lights: lights on
     #      TakeImage: lights on
     def createMutualExclusiveConstraints(self,model):
-        from itertools import product
-        for time in range(self.horizon):
-            # BEGIN STUDENT CODE
-            mutexes_simple = [
-                ('LowerTemp', 'RaiseTemp'),
-                ('LowerMoist', 'RaiseMoist'),
-                ('RaiseMoist', 'LowerHumid')
-            ]
-
-            actuators = {
-                            #  Fan,   Light, Wpump
-                "LowerTemp":  (True,  False, None),
-                "RaiseTemp":  (False, True,  None),
-                "LowerHumid": (True,  None,  False),
-                "LowerMoist": (True,  None,  False),
-                "RaiseMoist": (False, None,  True),
-                "Light":      (None,  True,  None),
-                "TakeImage":  (None,  True,  None)
-            }
-
-            fan_on = []
-            fan_off = []
-            light_on = []
-            light_off = []
-            wpump_on = []
-            wpump_off = []
-
-            for behavior in actuators:
-                fan, light, wpump = actuators[behavior]
-    
-                if fan == True:
-                    fan_on.append(behavior)
-                elif fan == False:
-                    fan_off.append(behavior)
-    
-                if light == True:
-                    light_on.append(behavior)
-                elif light == False:
-                    light_off.append(behavior)
-    
-                if wpump == True:
-                    wpump_on.append(behavior)
-                elif wpump == False:
-                    wpump_off.append(behavior)
-
-            mutex_candidates = []
-            mutex_candidates.extend(product(fan_on, fan_off))
-            mutex_candidates.extend(product(light_on, light_off))
-            mutex_candidates.extend(product(wpump_on, wpump_off))
-            mutex_candidates.extend(product(fan_on, fan_on))
-            mutex_candidates.extend(product(light_on, light_on))
-            mutex_candidates.extend(product(wpump_on, wpump_on))
-            mutex_candidates += mutexes_simple
-
-            filtered_mutex_candidates = []
-            for mutex_candidate in mutex_candidates:
-                local_l = [mutex_candidate[0], mutex_candidate[1]]
-                if len(set(local_l)) > 1:
-                    filtered_mutex_candidates.append(tuple(sorted(local_l)))
-
-            filtered_mutex_candidates = set(filtered_mutex_candidates)
-
-            for behavior1, behavior2 in filtered_mutex_candidates:
-                if behavior1 in self.behaviors_info and behavior2 in self.behaviors_info:
-                    model.Add(self.all_jobs[behavior1, time] + self.all_jobs[behavior2, time] <= 1)
-            # END STUDENT CODE
-            pass
+        # BEGIN STUDENT CODE
+        # The behaviors that are pairwise exclusive depend only on which
+        #   behaviors are scheduled, so the cliques are found once and each
+        #   is added as a single at-most-one constraint per time
+        for clique in mutexCliques(self.behaviors_info):
+            for time in range(self.horizon):
+                model.AddAtMostOne([self.all_jobs[behavior, time]
+                                    for behavior in clique]).OnlyEnforceIf(
+                                        self.guard('mutex', tuple(clique)))
+        # END STUDENT CODE
+        pass
 
     # CREATE and add constraints for maximum amount of time behaviors should
     # be run at night between [20,24) U [0,8)
@@ -162,8 +247,10 @@ class GreenhouseScheduler:
             max_night = self.behaviors_info[behavior].night_extent # in minutes
             # BEGIN STUDENT CODE
             m = self.minutes_per_chunk
-            model.Add(sum(self.all_jobs[behavior, t] for t in range(self.horizon)
-                        if (h:=((t*m)//60)%24) < 8 or h >= 20) <= max_night//m)
+            jobs = self.behaviorJobs(behavior)
+            model.Add(cp_model.LinearExpr.Sum([jobs[t] for t in range(self.horizon)
+                                               if (h:=((t*m)//60)%24) < 8 or h >= 20])
+                      <= max_night//m).OnlyEnforceIf(self.guard('night', behavior))
             # END STUDENT CODE
             pass
 
@@ -188,58 +275,397 @@ class GreenhouseScheduler:
             start = 0 if night else (8 * 60) // chunk
             end = self.horizon if night else (20 * 60) // chunk
             
+            # Each window is a slice of the behavior's literals, as an
+            #   at-most-one or a clause, rather than a linear sum
+            jobs = self.behaviorJobs(behavior)
+            guard = self.guard('spacing', behavior)
             window_len = min_b + 1
-            for left in range(start, end - window_len + 1):
-                model.Add(sum(self.all_jobs[behavior, t] for t in range(left, left + window_len)) <= 1)
-            
+            if (window_len > 1):
+                for left in range(start, end - window_len + 1):
+                    model.AddAtMostOne(jobs[left:left + window_len]).OnlyEnforceIf(guard)
+
             for left in range(start, end - max_b + 1):
-                model.Add(sum(self.all_jobs[behavior, t] for t in range(left, left + max_b)) >= 1)
+                model.AddBoolOr(jobs[left:left + max_b]).OnlyEnforceIf(guard)
             # END STUDENT CODE
 
+    # Minimize the weighted sum of the chunks each actuator is on, the number
+    #   of times behaviors switch on or off, and the ambient light while
+    #   Light runs (see ObjectiveWeights).  An actuator is on in a chunk if
+    #   any behavior that needs it on is running
+    def createObjective(self, model, weights):
+        on_chunks = []
+        for index, actuator in enumerate(actuatorNames):
+            users = [behavior for behavior in self.behaviors_info
+                     if behaviorActuators.get(behavior, (None,)*3)[index] == True]
+            if (not users): continue
+            for t in range(self.horizon):
+                on = model.NewBoolVar('%s_%i' % (actuator, t))
+                model.AddMaxEquality(on, [self.all_jobs[behavior, t]
+                                          for behavior in users])
+                on_chunks.append((weights.actuators.get(actuator, 1), on))
+
+        switches = []
+        for behavior in self.behaviors_info:
+            jobs = self.behaviorJobs(behavior)
+            for t in range(1, self.horizon):
+                switch = model.NewBoolVar('switch_%s_%i' % (behavior, t))
+                model.Add(switch >= jobs[t] - jobs[t-1])
+                model.Add(switch >= jobs[t-1] - jobs[t])
+                switches.append(switch)
+
+        ambient_light = []
+        if ("Light" in self.behaviors_info and weights.ambient_light):
+            ambient = chunkAmbient(readAmbient(weights.ambient_file),
+                                   self.minutes_per_chunk)
+            ambient_light = [(round(level/100), self.all_jobs["Light", t])
+                             for t, level in enumerate(ambient)
+                             if round(level/100) > 0]
+
+        self.objective_terms = {
+            'on_chunks': cp_model.LinearExpr.WeightedSum(
+                [on for _, on in on_chunks],
+                [weight for weight, _ in on_chunks]),
+            'switches': cp_model.LinearExpr.Sum(switches),
+            'ambient_light': cp_model.LinearExpr.WeightedSum(
+                [light for _, light in ambient_light],
+                [level for level, _ in ambient_light])}
+        model.Minimize(weights.on_chunks*self.objective_terms['on_chunks'] +
+                       weights.switches*self.objective_terms['switches'] +
+                       weights.ambient_light*self.objective_terms['ambient_light'])
+
     # Solve model.
     def solve(self,model, visualize, verbose):
         solver = cp_model.CpSolver()
-        status = solver.Solve(model)
+        if (self.max_time_in_seconds is not None):
+            solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        # Cores of assumptions are found by a single worker
+        if (self.explain): solver.parameters.num_workers = 1
+        status = solver_telemetry.solve(
+            solver, model, "GreenhouseScheduler.solve",
+            minutes_per_chunk=self.minutes_per_chunk,
+            behaviors=len(self.behaviors_info))
+        # The CP-SAT status (e.g., to tell infeasible from timed out)
+        self.status = status
+        self.solve_time = solver.WallTime()
+        self.objective_value = self.objective_bound = None
 
-        if status == cp_model.INFEASIBLE:
-            if verbose: print("infeasible")
+        if (status == cp_model.INFEASIBLE and self.explain):
+            self.conflict = self.minimalConflict(model, solver)
+            if verbose: print("infeasible:", self.conflict)
+            return None
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if verbose: print(solver.StatusName(status).lower())
             return None
         else:
-            save = self.sched_file != None
             if verbose: print("feasible")
-            assigned_jobs_list = {}
-            i =0
-            blist = self.behaviors_info.keys()
-
-            if save: f = open(self.sched_file,"w")
-
-            # (optionally) print and write out the schedule
-            for behavior in blist:
-                if verbose: print("Behavior:",behavior)
-                s = "  Times: "
-                for t in range(self.horizon):
-                    if solver.Value(self.all_jobs[behavior,t]) > 0:
-                        assigned_jobs_list[i,i,t/2.] = 1
-                        s += str(t/2.)+" "
-                        if save: 
-                            f.write(behavior+"Behavior"+" ")
-                            f.write(("0" if t/2 < 10 else "")+str(int(t//2))+
-                                    (":00" if t/2 == t//2 else ":30")+"-")
-                        x = t + 1
-                        if save:
-                            f.write(("0" if x/2 < 10 else "")+str(int(x//2))+
-                                    (":00" if x/2 == x//2 else ":30")+"\n")
-                if verbose: print(s)
-                if save: f.write("\n")
-                i += 1
+            # The chunks each behavior is scheduled for (used by schedule_cache)
+            self.chunk_times = chunk_times = {
+                behavior: [t for t in range(self.horizon)
+                           if solver.Value(self.all_jobs[behavior,t]) > 0]
+                for behavior in self.behaviors_info}
+            assigned_jobs_list = outputSchedule(chunk_times,
+                                                self.minutes_per_chunk,
+                                                self.sched_file, verbose)
 
             # Finally print the solution found.
-            if status == cp_model.OPTIMAL:
+            if self.objective_terms is not None:
+                self.objective_value = solver.ObjectiveValue()
+                self.objective_bound = solver.BestObjectiveBound()
+                if verbose:
+                    print("%s objective %d (%s), bound %d, solve time %.3fs"
+                          %(solver.StatusName(status).capitalize(),
+                            self.objective_value,
+                            ", ".join(["%s %d" %(name, solver.Value(term))
+                                       for name, term
+                                       in self.objective_terms.items()]),
+                            self.objective_bound, self.solve_time))
+            elif status == cp_model.OPTIMAL:
                if verbose: print('Student Optimal Schedule Length: %i' % solver.ObjectiveValue())
             if visualize:
-                visualize_solution.plot_binary(blist, self.horizon/2, False, 0.5, assigned_jobs_list)
+                visualize_solution.plot_binary(chunk_times.keys(), self.horizon/2, False, 0.5, assigned_jobs_list)
             return assigned_jobs_list
 
+    # The families in the solver's core of assumptions, less any that are not
+    #   needed: each is dropped in turn if the rest are still infeasible
+    def minimalConflict(self, model, solver):
+        families = {literal.Index(): family
+                    for family, literal in self.assumptions.items()}
+        conflict = [families[index] for index
+                    in solver.SufficientAssumptionsForInfeasibility()]
+        for family in list(conflict):
+            rest = [other for other in conflict if other != family]
+            model.ClearAssumptions()
+            model.AddAssumptions([self.assumptions[other] for other in rest])
+            solver = cp_model.CpSolver()
+            solver.parameters.num_workers = 1
+            if (self.max_time_in_seconds is not None):
+                solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+            status = solver_telemetry.solve(
+                solver, model, "GreenhouseScheduler.explain",
+                minutes_per_chunk=self.minutes_per_chunk,
+                behaviors=len(self.behaviors_info))
+            if (status == cp_model.INFEASIBLE): conflict = rest
+        model.ClearAssumptions()
+        model.AddAssumptions(list(self.assumptions.values()))
+        return conflict
+
+# The minimal conflict (see GreenhouseScheduler) of an infeasible problem,
+#   or None if it is feasible, or if no conflict was found within the time
+#   limit (which applies to each solve).
+# Infeasibility is proven on the plain model first, which all the workers
+#   can search: a single worker can take far longer to prove it with the
+#   assumptions, so the guarded model is only built to find the conflict
+def explainInfeasibility(behaviors_info, minutes_per_chunk, max_constraint=4,
+                         max_time_in_seconds=None):
+    problem = GreenhouseScheduler(behaviors_info, minutes_per_chunk,
+                                  max_constraint=max_constraint,
+                                  max_time_in_seconds=max_time_in_seconds)
+    problem.solveProblem()
+    if (problem.status != cp_model.INFEASIBLE): return None
+    problem = GreenhouseScheduler(behaviors_info, minutes_per_chunk,
+                                  max_constraint=max_constraint,
+                                  max_time_in_seconds=max_time_in_seconds,
+                                  explain=True)
+    problem.solveProblem()
+    return problem.conflict
+
+# Relax the BehaviorInfo fields of the behaviors in conflict (as found by
+#   explainInfeasibility) towards their values in defaults: durations no
+#   longer, night extents no shorter, and spacing no narrower.  Mutual
+#   exclusions have no fields, and behaviors without defaults are unchanged
+def relaxBehaviorsInfo(behaviors_info, conflict, defaults):
+    relaxed = dict(behaviors_info)
+    for family, behavior in conflict:
+        if (family == 'mutex' or not behavior in defaults): continue
+        info, default = relaxed[behavior], defaults[behavior]
+        info = BehaviorInfo(info.min_extent, info.night_extent,
+                            info.min_spacing, info.max_spacing)
+        if (family == 'duration'):
+            info.min_extent = min(info.min_extent, default.min_extent)
+        elif (family == 'night'):
+            info.night_extent = max(info.night_extent, default.night_extent)
+        elif (family == 'spacing'):
+            info.min_spacing = min(info.min_spacing, default.min_spacing)
+            info.max_spacing = max(info.max_spacing, default.max_spacing)
+        relaxed[behavior] = info
+    return relaxed
+
+# Given the chunks each behavior is scheduled for ({behavior: [chunk]}),
+#   (optionally) print and write out the schedule, and return it in the form
+#   returned by GreenhouseScheduler.solveProblem.  The file has the times of
+#   each chunk as HH:MM (or HH:MM:SS, for chunks that are not whole minutes)
+def outputSchedule(chunk_times, minutes_per_chunk, sched_file=None,
+                   verbose=False):
+    save = sched_file != None
+    assigned_jobs_list = {}
+    i =0
+
+    if save: f = open(sched_file,"w")
+
+    for behavior in chunk_times:
+        if verbose: print("Behavior:",behavior)
+        s = "  Times: "
+        for t in chunk_times[behavior]:
+            assigned_jobs_list[i,i,t/2.] = 1
+            s += str(t*minutes_per_chunk/60)+" "
+            if save:
+                f.write("%sBehavior %s-%s\n"
+                        %(behavior, schedule.mins_to_HHMM(t*minutes_per_chunk),
+                          schedule.mins_to_HHMM((t+1)*minutes_per_chunk)))
+        if verbose: print(s)
+        if save: f.write("\n")
+        i += 1
+    if save: f.close()
+    return assigned_jobs_list
+
+class MultiDayGreenhouseScheduler(GreenhouseScheduler):
+
+    # Schedules a number of consecutive days in one model, so that spacing
+    #   constraints hold across midnight (a behavior that runs late one night
+    #   does not run again soon after midnight, and one that may run at night
+    #   must still run within max_spacing of its last run the day before)
+    # behaviors_info: the behaviors for the first day (see GreenhouseScheduler)
+    # days: the number of days
+    # minutes_per_chunk: as for GreenhouseScheduler
+    # day_overrides: if not None, a dictionary whose keys are days (starting
+    #    at 0) and whose values are dictionaries of BehaviorInfo for some of
+    #    the behaviors.  Overrides hold from that day on (e.g., when the
+    #    plants move to a new growth stage)
+    # sched_pattern: if not None, the schedule for each day is written to
+    #    sched_pattern %day, for days starting at 1
+    # num_workers: the number of CP-SAT workers (defaults to the solver's)
+    # hint_daily: hint each day with the schedule of its own single-day
+    #    GreenhouseScheduler problem (which may break spacing at midnight,
+    #    but is much better than starting cold)
+    # explain: as for GreenhouseScheduler, with each family covering all days
+    # Durations and night limits are per day, as in GreenhouseScheduler.
+    #   The spacing windows of behaviors that may run at night start during
+    #   the day whose BehaviorInfo they use, and run on into the next day
+
+    def __init__(self, behaviors_info, days, minutes_per_chunk,
+                 day_overrides=None, sched_pattern=None, max_constraint=4,
+                 num_workers=None, max_time_in_seconds=None, hint_daily=True,
+                 explain=False):
+        self.behaviors_info = behaviors_info
+        self.days = days
+        self.minutes_per_chunk = minutes_per_chunk
+        self.day_chunks = 24*60//self.minutes_per_chunk
+        self.horizon = self.days*self.day_chunks
+        self.sched_pattern = sched_pattern
+        self.num_workers = num_workers
+        self.max_time_in_seconds = max_time_in_seconds
+        self.explain = explain
+        self.days_info = self.dailyBehaviorsInfo(day_overrides or {})
+        self.createModel(max_constraint)
+        if (hint_daily): self.addDailyHints(max_constraint)
+
+    # The BehaviorInfo of each behavior on each day, with the overrides
+    def dailyBehaviorsInfo(self, day_overrides):
+        days_info = []
+        behaviors_info = dict(self.behaviors_info)
+        for day in range(self.days):
+            for behavior, info in day_overrides.get(day, {}).items():
+                if (not behavior in behaviors_info):
+                    raise Exception("Day %d overrides unknown behavior %s"
+                                    %(day, behavior))
+                behaviors_info[behavior] = info
+            days_info.append(dict(behaviors_info))
+        return days_info
+
+    # The behavior's variables during the given day, in time order
+    def dayJobs(self, behavior, day):
+        return self.behaviorJobs(behavior)[day*self.day_chunks:
+                                           (day+1)*self.day_chunks]
+
+    # Solve the single-day problem of each distinct day (days with the same
+    #   BehaviorInfo share a solve) and hint its schedule for that day
+    def addDailyHints(self, max_constraint):
+        solved = {}
+        for day, behaviors_info in enumerate(self.days_info):
+            key = repr(sorted(behaviors_info.items()))
+            if (not key in solved):
+                single = GreenhouseScheduler(behaviors_info,
+                                             self.minutes_per_chunk,
+                                             max_constraint=max_constraint)
+                solver = cp_model.CpSolver()
+                status = solver_telemetry.solve(
+                    solver, single.model, "MultiDayGreenhouseScheduler.hint",
+                    minutes_per_chunk=self.minutes_per_chunk,
+                    behaviors=len(behaviors_info))
+                solved[key] = (
+                    {behavior: [solver.Value(job) for job
+                                in single.behaviorJobs(behavior)]
+                     for behavior in behaviors_info}
+                    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else
+                    None)
+            if (solved[key] is None): continue
+            for behavior in self.behaviors_info:
+                for job, value in zip(self.dayJobs(behavior, day),
+                                      solved[key][behavior]):
+                    self.model.AddHint(job, value)
+
+    def createDurationConstraints(self, model):
+        for day, behaviors_info in enumerate(self.days_info):
+            for behavior in self.behaviors_info:
+                duration = behaviors_info[behavior].min_extent
+                model.Add(cp_model.LinearExpr.Sum(self.dayJobs(behavior, day))
+                          >= duration // self.minutes_per_chunk).OnlyEnforceIf(
+                              self.guard('duration', behavior))
+
+    def createNightConstraints(self, model):
+        m = self.minutes_per_chunk
+        for day, behaviors_info in enumerate(self.days_info):
+            for behavior in self.behaviors_info:
+                max_night = behaviors_info[behavior].night_extent
+                jobs = self.dayJobs(behavior, day)
+                model.Add(cp_model.LinearExpr.Sum(
+                              [jobs[t] for t in range(self.day_chunks)
+                               if (h:=((t*m)//60)%24) < 8 or h >= 20])
+                          <= max_night//m).OnlyEnforceIf(
+                              self.guard('night', behavior))
+
+    def createSpacingConstraints(self, model):
+        chunk = self.minutes_per_chunk
+        for behavior in self.behaviors_info:
+            jobs = self.behaviorJobs(behavior)
+            guard = self.guard('spacing', behavior)
+            for day, behaviors_info in enumerate(self.days_info):
+                info = behaviors_info[behavior]
+                min_b = info.min_spacing // chunk
+                max_b = info.max_spacing // chunk
+                offset = day*self.day_chunks
+
+                # The windows that start during this day: at night, they may
+                #   end the next day (but not after the last day)
+                if (info.night_extent > 0):
+                    def lefts(window_len):
+                        return range(offset,
+                                     min(offset + self.day_chunks,
+                                         self.horizon - window_len + 1))
+                else:
+                    def lefts(window_len):
+                        return range(offset + (8 * 60) // chunk,
+                                     offset + (20 * 60) // chunk
+                                     - window_len + 1)
+
+                window_len = min_b + 1
+                if (window_len > 1):
+                    for left in lefts(window_len):
+                        model.AddAtMostOne(
+                            jobs[left:left + window_len]).OnlyEnforceIf(guard)
+
+                for left in lefts(max_b):
+                    model.AddBoolOr(jobs[left:left + max_b]).OnlyEnforceIf(guard)
+
+    def schedFile(self, day):
+        return (None if self.sched_pattern is None else
+                self.sched_pattern %(day+1))
+
+    # Returns a list of the schedules for each day, in the form returned by
+    #   GreenhouseScheduler.solveProblem, or None if there is none
+    def solve(self, model, visualize, verbose):
+        solver = cp_model.CpSolver()
+        if (self.num_workers is not None):
+            solver.parameters.num_workers = self.num_workers
+        if (self.max_time_in_seconds is not None):
+            solver.parameters.max_time_in_seconds = self.max_time_in_seconds
+        if (self.explain): solver.parameters.num_workers = 1
+        status = solver_telemetry.solve(
+            solver, model, "MultiDayGreenhouseScheduler.solve",
+            minutes_per_chunk=self.minutes_per_chunk,
+            behaviors=len(self.behaviors_info), days=self.days)
+        self.status = status
+        self.solve_time = solver.WallTime()
+
+        if (status == cp_model.INFEASIBLE and self.explain):
+            self.conflict = self.minimalConflict(model, solver)
+            if verbose: print("infeasible:", self.conflict)
+            return None
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if verbose: print(solver.StatusName(status).lower())
+            return None
+        if verbose: print("feasible")
+        # The chunks each behavior is scheduled for on each day
+        self.days_chunk_times = []
+        assigned_jobs_lists = []
+        for day in range(self.days):
+            jobs = {behavior: self.dayJobs(behavior, day)
+                    for behavior in self.behaviors_info}
+            chunk_times = {behavior: [t for t in range(self.day_chunks)
+                                      if solver.Value(jobs[behavior][t]) > 0]
+                           for behavior in self.behaviors_info}
+            self.days_chunk_times.append(chunk_times)
+            if verbose: print("Day %d:" %(day+1))
+            assigned_jobs_list = outputSchedule(chunk_times,
+                                                self.minutes_per_chunk,
+                                                self.schedFile(day), verbose)
+            assigned_jobs_lists.append(assigned_jobs_list)
+            if visualize:
+                visualize_solution.plot_binary(chunk_times.keys(),
+                                               self.day_chunks/2, False, 0.5,
+                                               assigned_jobs_list)
+        return assigned_jobs_lists
+
 if __name__ == "__main__":
     # This is an example Schedule generation problem
     #schedule 30 minute chunks
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# Large-neighborhood search (LNS) for orders that are too big to solve well
+#   with a single CP-SAT call on the full JobScheduler model.
+# Starting from an incumbent solution, each iteration fixes the start and
+#   scheduled variables of most tasks to their incumbent values, frees a
+#   neighborhood of tasks, and re-solves with a short time limit
+import random, time
+from ortools.sat.python import cp_model
+import job_scheduler as js
+import solver_telemetry
+
+# The neighborhoods that can be freed in each iteration:
+#  time_window: the tasks that run in a random window of time, plus a random
+#     subset of the unscheduled jobs
+#  machine: the tasks that can be done by a randomly chosen machine
+#  random_jobs: all the tasks of a random subset of the jobs
+neighborhood_types = ['time_window', 'machine', 'random_jobs']
+
+class JobSchedulerLNS(object):
+    # order: a JobScheduler instance
+    # neighborhood: one of neighborhood_types, or 'mixed' to cycle through them
+    # iterations: the number of neighborhoods to re-solve
+    # neighborhood_size: the fraction of the jobs (random_jobs) or of the
+    #   deadline (time_window) to free in each iteration
+    # initial_time, iteration_time: time limits, in seconds, for finding the
+    #   initial incumbent and for re-solving each neighborhood
+    def __init__(self, order, neighborhood='mixed', iterations=50,
+                 neighborhood_size=0.2, initial_time=5.0, iteration_time=1.0,
+                 num_search_workers=None, seed=0):
+        if (neighborhood != 'mixed' and not neighborhood in neighborhood_types):
+            raise Exception("Unknown neighborhood type: %s" %neighborhood)
+        self.order = order
+        self.neighborhood = neighborhood
+        self.iterations = iterations
+        self.neighborhood_size = neighborhood_size
+        self.initial_time = initial_time
+        self.iteration_time = iteration_time
+        self.num_search_workers = num_search_workers
+        self.random = random.Random(seed)
+        self.seed = seed
+
+    def _options(self, max_time):
+        return js.SolverOptions(self.num_search_workers, max_time,
+                                random_seed=self.seed)
+
+    # Run the LNS and return the best solution found (in the format returned
+    #   by JobScheduler.solve) and the objective over time, a list of
+    #   (seconds since start, neighborhood, objective) tuples, one for the
+    #   initial solve and one for each iteration
+    def solve(self, max_constraint=7):
+        order = self.order
+        start_time = time.perf_counter()
+        order.create_model(max_constraint)
+
+        solver = self._options(self.initial_time).create_solver()
+        status = solver_telemetry.solve(solver, order.model,
+                                        "JobSchedulerLNS.initial",
+                                        order=order.name)
+        if (status in (cp_model.OPTIMAL, cp_model.FEASIBLE)):
+            self._set_incumbent(solver)
+            best = solver.Value(order.objective)
+        elif (status == cp_model.UNKNOWN):
+            # Start from the empty schedule, which is always feasible
+            self.incumbent = {key: (0, 0, 0) for key in order.scheduleds}
+            self.solution = {}
+            best = 0
+        else:
+            return None, []
+        history = [(time.perf_counter() - start_time, 'initial', best)]
+
+        # Nothing to improve if the initial solve is already optimal
+        iterations = 0 if status == cp_model.OPTIMAL else self.iterations
+        for iteration in range(iterations):
+            neighborhood = (neighborhood_types[iteration%len(neighborhood_types)]
+                            if self.neighborhood == 'mixed' else
+                            self.neighborhood)
+            free = self._free_tasks(neighborhood)
+            solver, status = self._solve_neighborhood(free)
+            if (status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+                and solver.Value(order.objective) >= best):
+                best = solver.Value(order.objective)
+                self._set_incumbent(solver)
+            history.append((time.perf_counter() - start_time, neighborhood,
+                            best))
+        return self.solution, history
+
+    def _set_incumbent(self, solver):
+        order = self.order
+        self.incumbent = {key: (solver.Value(order.scheduleds[key]),
+                                solver.Value(order.starts[key]),
+                                solver.Value(order.ends[key]))
+                          for key in order.scheduleds}
+        self.solution = order.extract_solution(solver)
+
+    # Return the set of (job, task) pairs that are free in the neighborhood
+    def _free_tasks(self, neighborhood):
+        order = self.order
+        if (neighborhood == 'random_jobs'):
+            jobs = self.random.sample(order.jobs,
+                                      max(1, int(self.neighborhood_size
+                                                 * len(order.jobs))))
+            names = set(job.name for job in jobs)
+            return set(job_task for job_task in order.keys_by_job_task
+                       if job_task[0] in names)
+        elif (neighborhood == 'machine'):
+            machine = self.random.choice(order.machines)
+            return set(key[:2]
+                       for key in order.keys_by_machine.get(machine.name, []))
+        else:
+            width = max(1, int(self.neighborhood_size * order.deadline))
+            window_start = self.random.randint(1, max(1, order.deadline - width))
+            window_end = window_start + width
+            free = set()
+            unscheduled = []
+            for jname, keys in order.keys_by_job.items():
+                scheduled = [key for key in keys if self.incumbent[key][0]]
+                if (len(scheduled) == 0): unscheduled.append(keys)
+                for key in scheduled:
+                    _, start, end = self.incumbent[key]
+                    if (start < window_end and end > window_start):
+                        free.add(key[:2])
+            for keys in self.random.sample(unscheduled,
+                                           int(self.neighborhood_size
+                                               * len(unscheduled))):
+                free.update(key[:2] for key in keys)
+            return free
+
+    # Solve a copy of the model in which all tasks not in free are fixed
+    #   to their incumbent values, hinting the incumbent for the free ones
+    def _solve_neighborhood(self, free):
+        order = self.order
+        model = order.model.Clone()
+        for key, (scheduled, start, _) in self.incumbent.items():
+            sched_var = model.GetBoolVarFromProtoIndex(
+                order.scheduleds[key].Index())
+            start_var = model.GetIntVarFromProtoIndex(
+                order.starts[key].Index())
+            if (key[:2] in free):
+                model.AddHint(sched_var, scheduled)
+                model.AddHint(start_var, start)
+            else:
+                model.Add(sched_var == scheduled)
+                if (scheduled): model.Add(start_var == start)
+        solver = self._options(self.iteration_time).create_solver()
+        status = solver_telemetry.solve(solver, model,
+                                        "JobSchedulerLNS.neighborhood",
+                                        order=order.name, free=len(free))
+        return solver, status
+
+if __name__ == '__main__':
+    import argparse
+    from parse_orders import parse_orders
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', help='The order file to solve')
+    parser.add_argument('-n', '--neighborhood', default='mixed',
+                        help='Neighborhood type: mixed or one of %s'
+                        %neighborhood_types)
+    parser.add_argument('-i', '--iterations', default=50, type=int,
+                        help='Number of LNS iterations')
+    parser.add_argument('--size', default=0.2, type=float,
+                        help='Fraction of jobs or of the deadline to free')
+    parser.add_argument('--iteration-time', default=1.0, type=float,
+                        help='Time limit, in seconds, for each iteration')
+    parser.add_argument('-w', '--workers', default=None, type=int,
+                        help='Number of parallel CP-SAT search workers')
+    args = parser.parse_args()
+
+    for order in parse_orders(args.filename):
+        lns = JobSchedulerLNS(order, args.neighborhood, args.iterations,
+                              args.size, iteration_time=args.iteration_time,
+                              num_search_workers=args.workers)
+        solution, history = lns.solve()
+        print(order.name)
+        for elapsed, neighborhood, objective in history:
+            print("  %8.3f %-12s %d" %(elapsed, neighborhood, objective))
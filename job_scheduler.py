@@ -1,4 +1,6 @@
 from ortools.sat.python import cp_model
+import pickle, queue, threading
+import solver_telemetry
 
 class SchedObj(object):
     def __init__(self, name):
@@ -62,6 +64,103 @@ class Job(SchedObj):
         super(Job, self).__init__(name)
         self.tasks = tasks
 
+# Parameters for the CP-SAT search done by JobScheduler.solve.
+# Parameters that are None are left at the solver's defaults
+class SolverOptions(object):
+    def __init__(self, num_search_workers=None, max_time_in_seconds=None,
+                 relative_gap_limit=None, random_seed=None,
+                 log_search_progress=False):
+        self.num_search_workers = num_search_workers
+        self.max_time_in_seconds = max_time_in_seconds
+        self.relative_gap_limit = relative_gap_limit
+        self.random_seed = random_seed
+        self.log_search_progress = log_search_progress
+
+    def __repr__(self):
+        return ("<SolverOptions workers: %s, time: %s, gap: %s, seed: %s%s>"
+                %(self.num_search_workers, self.max_time_in_seconds,
+                  self.relative_gap_limit, self.random_seed,
+                  ", LOG" if self.log_search_progress else ""))
+
+    # Create a CpSolver whose parameters are set from these options
+    def create_solver(self):
+        solver = cp_model.CpSolver()
+        params = solver.parameters
+        if (self.num_search_workers is not None):
+            params.num_workers = self.num_search_workers
+        if (self.max_time_in_seconds is not None):
+            params.max_time_in_seconds = self.max_time_in_seconds
+        if (self.relative_gap_limit is not None):
+            params.relative_gap_limit = self.relative_gap_limit
+        if (self.random_seed is not None):
+            params.random_seed = self.random_seed
+        params.log_search_progress = self.log_search_progress
+        return solver
+
+# Solution callback used by JobScheduler.solve_stream, which puts each
+#   improving solution on the solutions queue
+class SolutionStreamer(cp_model.CpSolverSolutionCallback):
+    def __init__(self, scheduler, solutions):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.scheduler = scheduler
+        self.solutions = solutions
+        self.best = None
+
+    def OnSolutionCallback(self):
+        scheduler = self.scheduler
+        objective = self.Value(scheduler.objective)
+        if (self.best is not None and objective <= self.best): return
+        self.best = objective
+        self.solutions.put(
+            {'solution': scheduler.extract_solution(self),
+             'objective': objective,
+             'value': self.Value(scheduler.value),
+             'cost': self.Value(scheduler.cost) if scheduler.has_costs else 0,
+             'wall_time': self.WallTime()})
+
+# Version of the files written by JobScheduler.save_model
+model_file_version = 1
+
+# Load a JobScheduler, with its model, saved by JobScheduler.save_model.
+# The model can be solved, or constrained further, as if create_model had
+#   been called.
+# This is for persistence (e.g., to solve or check a model built elsewhere),
+#   not speed: the model is stored as a text-format proto (CP-SAT's Python
+#   proto can only parse text), and parsing it takes about as long as
+#   building the model again
+def load_model(filename):
+    with open(filename, "rb") as f:
+        state = pickle.load(f)
+    if (state.get('version') != model_file_version):
+        raise Exception("Unsupported model file version in %s: %s"
+                        %(filename, state.get('version')))
+    order = JobScheduler(*state['order'])
+    order.model = cp_model.CpModel()
+    order.model.Proto().parse_text_format(state['model'])
+    order._restore_variables(state)
+    return order
+
+# Add command-line arguments for the SolverOptions to an argparse parser
+def add_solver_arguments(parser):
+    parser.add_argument('-w', '--workers', default=None, type=int,
+                        help='Number of parallel CP-SAT search workers')
+    parser.add_argument('--time-limit', default=None, type=float,
+                        help='Maximum solve time, in seconds, for each order')
+    parser.add_argument('--gap', default=None, type=float,
+                        help='Stop when the relative optimality gap is below this')
+    parser.add_argument('--seed', default=None, type=int,
+                        help='Random seed for the CP-SAT search')
+    parser.add_argument('--log-search', action='store_true',
+                        help='Log the CP-SAT search progress')
+    parser.add_argument('--telemetry', default=None,
+                        help='Append a JSON-lines record of each solve to this file')
+
+# Also starts recording telemetry, if the --telemetry argument is given
+def solver_options_from_args(args):
+    if (args.telemetry): solver_telemetry.set_sink(args.telemetry)
+    return SolverOptions(args.workers, args.time_limit, args.gap, args.seed,
+                         args.log_search)
+
 class JobScheduler():
     def __init__(self, name, deadline, jobs, tasks, machines, parts, tools,
                  use_costs, use_parts):
@@ -75,6 +174,14 @@ class JobScheduler():
         self.use_costs = use_costs
         self.use_parts = use_parts
         self.model = None
+        # Name-keyed registries of the order's items, for constant-time lookup
+        self.jobs_by_name = {job.name: job for job in jobs}
+        self.tasks_by_name = {task.name: task for task in tasks}
+        self.machines_by_name = {machine.name: machine for machine in machines}
+        self.parts_by_name = {part.name: part for part in parts}
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.solver_options = SolverOptions()
+        self.status = None
 
         # Add any additional instance variables
         # BEGIN STUDENT CODE
@@ -105,8 +212,15 @@ class JobScheduler():
 
     # max_constraint: add all constraints <= max_constraint
     # Constraints 5 and 6 are added only if self.use_parts is True
-    def create_model(self, max_constraint=6):
+    # presolve: tighten the variable domains to the time window of each task
+    #   and encode task completion with one literal per job
+    # symmetry_breaking: order identical machines and identical jobs (see
+    #   create_symmetry_breaking_constraints)
+    def create_model(self, max_constraint=6, presolve=True,
+                     symmetry_breaking=False):
         self.model = cp_model.CpModel()
+        self.presolve = presolve
+        self.compute_task_windows(max_constraint >= 4)
         self.create_job_task_variables()
         if (max_constraint >= 1): self.create_task_constraints()
         if (max_constraint >= 2): self.create_machine_constraints()
@@ -115,8 +229,31 @@ class JobScheduler():
         if (self.use_parts):
             if (max_constraint >= 5): self.create_tools_constraints()
             if (max_constraint >= 6): self.create_parts_constraints()
+        if (symmetry_breaking):
+            self.create_symmetry_breaking_constraints(max_constraint)
         self.add_optimization(max_constraint >= 7)
 
+    # Compute the window (earliest start, latest end) of each job's tasks.
+    # If the tasks of a job are ordered and must all be done (chained),
+    #   a task cannot start until the tasks before it in the job are done,
+    #   and must end in time for the tasks after it, using the shortest
+    #   machine duration of each of those tasks.
+    # Without presolve, every window is the whole schedule
+    def compute_task_windows(self, chained):
+        self.windows = {}
+        for job in self.jobs:
+            durations = [min([tm.duration for tm in task.task_machines],
+                             default=0) for task in job.tasks]
+            before = 0; after = sum(durations)
+            for task, duration in zip(job.tasks, durations):
+                after -= duration
+                if (self.presolve and chained):
+                    window = (1 + before, self.deadline - after)
+                else:
+                    window = (1, self.deadline)
+                self.windows[job.name, task.name] = window
+                before += duration
+
     # Create variables for each job/task/machine
     # You likely will need integer variables for the start and end of
     #   each combination of tasks and machines that can be used to complete
@@ -124,11 +261,7 @@ class JobScheduler():
     #   was actually scheduled, and an interval variable that combines the
     #   start, end, and duration of the task
     def create_job_task_variables(self):
-        self.starts = {}
-        self.ends = {}
-        self.scheduleds = {}
-        self.intervals = {}
-
+        self._reset_variables()
         model = self.model
         self.cost = model.NewIntVar(0, 1000000, "cost")
         for job in self.jobs:
@@ -136,17 +269,51 @@ class JobScheduler():
                 for tm in task.task_machines:
                     key = self._key(job, task, tm.machine)
                     prefix = self._prefix(job, task, tm.machine)
-                    self.starts[key] = model.NewIntVar(1, self.deadline,
+                    earliest, latest = self.windows[job.name, task.name]
+                    fits = earliest + tm.duration <= latest
+                    if (not self.presolve or not fits):
+                        earliest, latest = 1, self.deadline
+                        start_max, end_min = latest, earliest
+                    else:
+                        start_max = latest - tm.duration
+                        end_min = earliest + tm.duration
+                    self.starts[key] = model.NewIntVar(earliest, start_max,
                                                        prefix+"-start")
-                    self.ends[key] = model.NewIntVar(1, self.deadline,
+                    self.ends[key] = model.NewIntVar(end_min, latest,
                                                      prefix+"-end")
                     self.scheduleds[key] = model.NewBoolVar(prefix+"-sched")
+                    if (self.presolve and not fits):
+                        model.Add(self.scheduleds[key] == False)
                     self.intervals[key] = \
                          model.NewOptionalIntervalVar(self.starts[key],
                                                       tm.duration,
                                                       self.ends[key],
                                                       self.scheduleds[key],
                                                       prefix+"-int")
+                    self._index_key(key)
+
+    def _reset_variables(self):
+        self.starts = {}
+        self.ends = {}
+        self.scheduleds = {}
+        self.intervals = {}
+        # Keys grouped by job, (job, task), task and machine name, so that
+        #   the constraint builders don't need to rescan the dictionaries
+        self.keys_by_job = {}
+        self.keys_by_job_task = {}
+        self.keys_by_task = {}
+        self.keys_by_machine = {}
+
+    def _index_key(self, key):
+        jname, tname, mname = key
+        self.keys_by_job.setdefault(jname, []).append(key)
+        self.keys_by_job_task.setdefault((jname, tname), []).append(key)
+        self.keys_by_task.setdefault(tname, []).append(key)
+        self.keys_by_machine.setdefault(mname, []).append(key)
+
+    # Return the values of the variable dictionary for the given index keys
+    def _vars(self, variables, keys):
+        return [variables[key] for key in keys]
 
     # Add constraints such that, for each job, each task must 
     #   be achieved by only one machine
@@ -155,7 +322,8 @@ class JobScheduler():
         for job in self.jobs:
             for task in job.tasks:
                 # BEGIN STUDENT CODE
-                model.Add(sum([v for k, v in self.scheduleds.items() if k[0] == job.name and k[1] == task.name]) <= 1)
+                keys = self.keys_by_job_task.get((job.name, task.name), [])
+                model.Add(sum(self._vars(self.scheduleds, keys)) <= 1)
                 # END STUDENT CODE
                 pass
 
@@ -165,7 +333,8 @@ class JobScheduler():
         model = self.model
         for machine in self.machines:
             # BEGIN STUDENT CODE
-            model.AddNoOverlap([v for k, v in self.intervals.items() if k[2] == machine.name])
+            keys = self.keys_by_machine.get(machine.name, [])
+            model.AddNoOverlap(self._vars(self.intervals, keys))
             # END STUDENT CODE
             pass
 
@@ -195,10 +364,22 @@ class JobScheduler():
     #   and you need to account for that in the constraints
     def create_task_completion_constraints(self):
         model = self.model
+        self.job_scheduleds = {}
         for job in self.jobs:
             # BEGIN STUDENT CODE
+            if (self.presolve):
+                # Exactly one machine is scheduled for each task of the job
+                #   if the job is scheduled, and none otherwise
+                job_sched = model.NewBoolVar(job.name+"-sched")
+                self.job_scheduleds[job.name] = job_sched
+                for task in job.tasks:
+                    keys = self.keys_by_job_task.get((job.name, task.name), [])
+                    model.Add(sum(self._vars(self.scheduleds, keys))
+                              == job_sched)
+                continue
             foo = model.NewBoolVar('foo')
-            scheds = [v for k, v in self.scheduleds.items() if k[0] == job.name]
+            scheds = self._vars(self.scheduleds,
+                                self.keys_by_job.get(job.name, []))
             model.Add(sum(scheds) > 0).OnlyEnforceIf(foo)
             model.Add(sum(scheds) <= 0).OnlyEnforceIf(foo.Not())
             model.Add(sum(scheds) == len(job.tasks)).OnlyEnforceIf(foo)
@@ -212,20 +393,21 @@ class JobScheduler():
     def create_tools_constraints(self):
         model = self.model
         # BEGIN STUDENT CODE
+        # The tools in use at any time are those of the scheduled tasks
+        #   whose intervals contain that time, so this is a cumulative
+        #   constraint on the task intervals (which CP-SAT propagates
+        #   directly, rather than expanding a reservoir into pairs of events)
         for tool in self.tools:
-            times = []
+            intervals = []
             demands = []
-            actives = []
             for task in self.tasks:
                 if tool in task.tools:
                     count = task.tools.count(tool)
-                    starts = [v for k, v in self.starts.items() if k[1] == task.name]
-                    ends = [v for k, v in self.ends.items() if k[1] == task.name]
-                    scheds = [v for k, v in self.scheduleds.items() if k[1] == task.name]
-                    times += starts + ends
-                    demands += [count] * len(scheds) + [-count] * len(scheds)
-                    actives += scheds + scheds
-            model.AddReservoirConstraintWithActive(times, demands, actives, 0, tool.num)
+                    keys = self.keys_by_task.get(task.name, [])
+                    intervals += self._vars(self.intervals, keys)
+                    demands += [count] * len(keys)
+            if (intervals):
+                model.AddCumulative(intervals, demands, tool.num)
         # END STUDENT CODE
         pass
 
@@ -243,25 +425,115 @@ class JobScheduler():
             demands = []
             actives = []
             for task in self.tasks:
+                keys = self.keys_by_task.get(task.name, [])
                 if part in task.parts:
                     count = task.parts.count(part)
-                    starts = [v for k, v in self.starts.items() if k[1] == task.name]
-                    scheds = [v for k, v in self.scheduleds.items() if k[1] == task.name]
+                    starts = self._vars(self.starts, keys)
+                    scheds = self._vars(self.scheduleds, keys)
                     times += starts
                     demands += [count] * len(scheds)
                     actives += scheds
 
                 if self.isPartsTask(task) and task.produced_part == part:
-                    ends = [v for k, v in self.ends.items() if k[1] == task.name]
-                    scheds = [v for k, v in self.scheduleds.items() if k[1] == task.name]
+                    ends = self._vars(self.ends, keys)
+                    scheds = self._vars(self.scheduleds, keys)
                     times += ends
                     demands += [-task.quantity] * len(ends)
                     actives += scheds
 
-            model.AddReservoirConstraintWithActive(times, demands, actives, 0, part.quantity)
+            if (times):
+                model.AddReservoirConstraintWithActive(times, demands, actives,
+                                                       0, part.quantity)
         # END STUDENT CODE
         pass
 
+    # Everything the model knows about a task, other than its name
+    def _task_signature(self, task):
+        return (tuple(sorted([(tm.machine.name, tm.duration, tm.value)
+                              for tm in task.task_machines])),
+                tuple(sorted([tool.name for tool in task.tools])),
+                tuple(sorted([part.name for part in task.parts])),
+                ((getattr(task.produced_part, 'name', None), task.quantity)
+                 if self.isPartsTask(task) else None))
+
+    # Return the groups (of two or more) of interchangeable machines: those
+    #   with the same energy cost that can do the same tasks, with the same
+    #   durations and values
+    def identical_machines(self):
+        task_machines = {machine.name: [] for machine in self.machines}
+        for task in self.tasks:
+            for tm in task.task_machines:
+                task_machines.setdefault(tm.machine.name, []).append(
+                    (task.name, tm.duration, tm.value))
+        groups = {}
+        for machine in self.machines:
+            signature = (machine.energy_cost,
+                         tuple(sorted(task_machines[machine.name])))
+            groups.setdefault(signature, []).append(machine)
+        return [group for group in groups.values() if len(group) > 1]
+
+    # Return the groups (of two or more) of interchangeable jobs: those whose
+    #   tasks are the same, or differ only in their names
+    def identical_jobs(self):
+        groups = {}
+        for job in self.jobs:
+            if (not job.tasks): continue
+            signature = tuple([self._task_signature(task)
+                               for task in job.tasks])
+            groups.setdefault(signature, []).append(job)
+        return [group for group in groups.values() if len(group) > 1]
+
+    # Swapping everything scheduled on two identical machines, or the
+    #   schedules of two identical jobs, gives another solution with the same
+    #   objective, so only one of each set of equivalent solutions is kept:
+    #  - Of two identical machines, the first (job, task), in the order of
+    #    the jobs, done on either is done on the earlier machine.  With one
+    #    machine per task, this orders the machines lexicographically by the
+    #    tasks they do.
+    #  - Of two identical jobs, the later one is only scheduled if the
+    #    earlier one is, and does not start before it.  This needs the job
+    #    completion literals of the presolve encoding
+    def create_symmetry_breaking_constraints(self, max_constraint):
+        model = self.model
+        if (max_constraint >= 1):
+            job_tasks = [(job.name, task.name)
+                         for job in self.jobs for task in job.tasks]
+            for group in self.identical_machines():
+                for first, second in zip(group, group[1:]):
+                    used = None     # Is first used for any earlier task?
+                    for jname, tname in job_tasks:
+                        key1 = (jname, tname, first.name)
+                        if (not key1 in self.scheduleds): continue
+                        sched1 = self.scheduleds[key1]
+                        sched2 = self.scheduleds[jname, tname, second.name]
+                        if (used is None):
+                            model.Add(sched2 == False)
+                            used = sched1
+                        else:
+                            model.AddImplication(sched2, used)
+                            prefix = model.NewBoolVar("")
+                            model.AddBoolOr([used, sched1]).OnlyEnforceIf(prefix)
+                            used = prefix
+
+        if (self.presolve and max_constraint >= 4):
+            for group in self.identical_jobs():
+                job_starts = []
+                for job in group:
+                    job_start = model.NewIntVar(1, self.deadline,
+                                                job.name+"-start")
+                    first_task = job.tasks[0].name
+                    for key in self.keys_by_job_task.get((job.name, first_task),
+                                                         []):
+                        model.Add(job_start == self.starts[key]).OnlyEnforceIf(
+                            self.scheduleds[key])
+                    job_starts.append(job_start)
+                for i in range(len(group) - 1):
+                    sched1 = self.job_scheduleds[group[i].name]
+                    sched2 = self.job_scheduleds[group[i+1].name]
+                    model.AddImplication(sched2, sched1)
+                    model.Add(job_starts[i] <= job_starts[i+1]).OnlyEnforceIf(
+                        sched1, sched2)
+
     # Set the self.value variable to be the total value of objects produced
     #  by all the scheduled tasks
     def add_values(self):
@@ -281,17 +553,15 @@ class JobScheduler():
     def add_costs(self):
         model = self.model
         # BEGIN STUDENT CODE
+        costs = []
         for task in self.tasks:
-            for tm in task.task_machines:
-                scheds = [v for k, v in self.scheduleds.items() if k[2] == tm.machine.name and k[1] == task.name]
-                for s in scheds:
-                    self.cost += tm.duration * tm.machine.energy_cost * s
-
-        for task in self.tasks:
-            scheds = [v for k, v in self.scheduleds.items() if k[1] == task.name]
-            for s in scheds:
-                for p in task.parts:
-                    self.cost += p.cost * s
+            energy_costs = {tm.machine.name: tm.duration*tm.machine.energy_cost
+                            for tm in task.task_machines}
+            parts_cost = sum(p.cost for p in task.parts)
+            for key in self.keys_by_task.get(task.name, []):
+                s = self.scheduleds[key]
+                costs.append((energy_costs[key[2]] + parts_cost) * s)
+        model.Add(self.cost == sum(costs))
 
         # END STUDENT CODE
 
@@ -299,12 +569,101 @@ class JobScheduler():
         model = self.model
         self.objective = model.NewIntVar(0, 1000000, "objective")
         self.add_values()
-        if (self.use_costs and add_costs):
+        self.has_costs = self.use_costs and add_costs
+        if (self.has_costs):
             self.add_costs()
             model.Add(self.objective == (self.value - self.cost))
         else:
             model.Add(self.objective == self.value)
         model.Maximize(self.objective)
+
+    # Use a previous solution (in the format returned by solve) as hints for
+    #   the next solve of the model.  Must be called after create_model.
+    # Jobs, tasks and machines in the solution that are not in this order
+    #   are quietly ignored, as are jobs whose tasks no longer match
+    def add_hints(self, solution):
+        model = self.model
+        for jname, sched_machines in solution.items():
+            job = self.jobs_by_name.get(jname)
+            if (job is None or len(sched_machines) != len(job.tasks)): continue
+            for task, (mname, start, duration) in zip(job.tasks,
+                                                      sched_machines):
+                keys = self.keys_by_job_task.get((jname, task.name), [])
+                if (not (jname, task.name, mname) in keys): continue
+                for key in keys:
+                    is_scheduled = (key[2] == mname)
+                    model.AddHint(self.scheduleds[key], is_scheduled)
+                    if (is_scheduled):
+                        model.AddHint(self.starts[key], start)
+                        model.AddHint(self.ends[key], start + duration)
+
+    # Constrain the model (or a copy of it, made with model.Clone()) so that
+    #   its only solution is the given one (in the format returned by solve)
+    def add_solution_constraints(self, solution, model=None):
+        model = model if model is not None else self.model
+        scheduled = set()
+        for jname, sched_machines in solution.items():
+            tasks = self.jobs_by_name[jname].tasks
+            for task, (mname, start, duration) in zip(tasks, sched_machines):
+                key = (jname, task.name, mname)
+                if (not key in self.scheduleds):
+                    raise Exception("Task %s of job %s cannot be done on %s"
+                                    %(task.name, jname, mname))
+                model.Add(self.scheduleds[key] == True)
+                model.Add(self.starts[key] == start)
+                model.Add(self.ends[key] == start + duration)
+                scheduled.add(key)
+        for key, sched in self.scheduleds.items():
+            if (not key in scheduled): model.Add(sched == False)
+
+    # Return whether the solution satisfies all the constraints of the
+    #   model.  The model is copied, rather than rebuilt, so the same built
+    #   (or loaded) model can check any number of solutions
+    def check_solution(self, solution, options=None):
+        options = options if options is not None else self.solver_options
+        model = self.model.Clone()
+        try: self.add_solution_constraints(solution, model)
+        except Exception: return False
+        status = solver_telemetry.solve(options.create_solver(), model,
+                                        "JobScheduler.check_solution",
+                                        order=self.name)
+        return status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+
+    # Save the built model to a file, along with the order and the indices
+    #   of the variables of each (job, task, machine) key, so that
+    #   load_model can recreate it (see load_model: this is not faster than
+    #   building it)
+    def save_model(self, filename):
+        variables = {key: (self.starts[key].Index(), self.ends[key].Index(),
+                           self.scheduleds[key].Index(),
+                           self.intervals[key].Index())
+                     for key in self.scheduleds}
+        state = {'version': model_file_version,
+                 'order': (self.name, self.deadline, self.jobs, self.tasks,
+                           self.machines, self.parts, self.tools,
+                           self.use_costs, self.use_parts),
+                 'presolve': self.presolve, 'has_costs': self.has_costs,
+                 'objective': self.objective.Index(),
+                 'value': self.value.Index(), 'cost': self.cost.Index(),
+                 'variables': variables, 'model': str(self.model.Proto())}
+        with open(filename, "wb") as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+
+    def _restore_variables(self, state):
+        model = self.model
+        self._reset_variables()
+        for key, (start, end, scheduled, interval) in state['variables'].items():
+            self.starts[key] = model.GetIntVarFromProtoIndex(start)
+            self.ends[key] = model.GetIntVarFromProtoIndex(end)
+            self.scheduleds[key] = model.GetBoolVarFromProtoIndex(scheduled)
+            self.intervals[key] = model.GetIntervalVarFromProtoIndex(interval)
+            self._index_key(key)
+        self.objective = model.GetIntVarFromProtoIndex(state['objective'])
+        self.value = model.GetIntVarFromProtoIndex(state['value'])
+        self.cost = model.GetIntVarFromProtoIndex(state['cost'])
+        self.presolve = state['presolve']
+        self.has_costs = state['has_costs']
+
     # If the status is not INFEASIBLE, return a dictionary of scheduled jobs,
     #   where the job name is the dictionary key and the value is a list of
     #   tuples of the machine names that accomplish each task the start/end
@@ -312,22 +671,81 @@ class JobScheduler():
     # For instance, solution['j1'] = [('m1', 0, 1), ('m3', 3, 2)]
     #   indicates that job j1 has two tasks, the first starts at time 0 and
     #   runs for one hour; the second starts at time 3 and runs for 2 hours
-    def solve(self):
-        solver = cp_model.CpSolver()
-        status = solver.Solve(self.model)
-        if (status == cp_model.INFEASIBLE):
+    # options is a SolverOptions instance; if None, self.solver_options is used.
+    # Returns None as the solution if the status is INFEASIBLE, or if the
+    #   search stopped (e.g., on the time limit) before finding any solution
+    def solve(self, options=None):
+        options = options if options is not None else self.solver_options
+        solver = options.create_solver()
+        self.status = solver_telemetry.solve(solver, self.model,
+                                             "JobScheduler.solve",
+                                             order=self.name)
+        if (self.status not in (cp_model.OPTIMAL, cp_model.FEASIBLE)):
             return None, solver
         else:
-            solution = {}
-            for job in self.jobs:
-                sched_machines = []
-                for task in job.tasks:
-                    for tm in task.task_machines:
-                        key = self._key(job, task, tm.machine)
-                        if solver.Value(self.scheduleds[key]):
-                            start = int(solver.Value(self.starts[key]))
-                            sched_machines.append((tm.machine.name, start,
-                                                   tm.duration))
-                if (len(sched_machines) > 0):
-                    solution[job.name] = sched_machines
-            return solution, solver
+            return self.extract_solution(solver), solver
+
+    # Generator version of solve, which yields each improving solution as
+    #   soon as CP-SAT finds it.  Each item is a dictionary with the solution
+    #   (in the same format as returned by solve), its objective, value and
+    #   cost, and the wall time at which it was found.
+    # The search runs in a separate thread and is stopped if the generator is
+    #   closed, for instance when the caller breaks out of the loop once a
+    #   solution is good enough.  After the generator is exhausted,
+    #   self.status holds the final status of the search
+    def solve_stream(self, options=None):
+        options = options if options is not None else self.solver_options
+        solver = options.create_solver()
+        solutions = queue.Queue()
+        callback = SolutionStreamer(self, solutions)
+
+        def search():
+            try:
+                self.status = solver_telemetry.solve(
+                    solver, self.model, "JobScheduler.solve_stream", callback,
+                    order=self.name)
+            finally: solutions.put(None)
+
+        thread = threading.Thread(target=search, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = solutions.get()
+                if (item is None): break
+                yield item
+        finally:
+            solver.StopSearch()
+            thread.join()
+
+    # Create the solution dictionary (see solve) from the variable values
+    #   of a solver (or solution callback)
+    def extract_solution(self, solver):
+        solution = {}
+        for job in self.jobs:
+            sched_machines = []
+            for task in job.tasks:
+                for tm in task.task_machines:
+                    key = self._key(job, task, tm.machine)
+                    if solver.Value(self.scheduleds[key]):
+                        start = int(solver.Value(self.starts[key]))
+                        sched_machines.append((tm.machine.name, start,
+                                               tm.duration))
+            if (len(sched_machines) > 0):
+                solution[job.name] = sched_machines
+        return solution
+
+    # Return a dictionary with the status, objective, best objective bound
+    #   and relative gap of the last call to solve.  The objective and gap
+    #   are None if no solution was found
+    def solve_stats(self, solver):
+        stats = {'status': solver.StatusName(self.status),
+                 'objective': None, 'bound': solver.BestObjectiveBound(),
+                 'gap': None, 'branches': solver.NumBranches(),
+                 'conflicts': solver.NumConflicts(),
+                 'wall_time': solver.WallTime()}
+        if (self.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)):
+            objective = solver.ObjectiveValue()
+            stats['objective'] = objective
+            stats['gap'] = (abs(stats['bound'] - objective)
+                            / max(1, abs(objective)))
+        return stats
@@ -1,4 +1,6 @@
+import bisect, queue
 import schedule as sched
+import planning_worker
 
 class Layer:
     def __init__(self, agent):
@@ -14,14 +16,16 @@ class BehavioralLayer(Layer):
         for behavior in behaviors:
             behavior.setSensors(sensors)
             behavior.setActuators(actuators)
-        self.enabled = []
+        # The enabled behaviors, in the order they were started (a dict used
+        #   as an ordered set)
+        self.enabled = {}
         super(BehavioralLayer, self).__init__(agent)
         # Initialize any extra variables here
+        self.behaviorsByName = {behavior.name: behavior
+                                for behavior in behaviors}
 
     def getBehavior(self, name):
-        for b in self.behaviors:
-            if (b.name == name): return b
-        return None
+        return self.behaviorsByName.get(name)
 
     def isEnabled(self, behavior):
         return behavior in self.enabled
@@ -31,7 +35,7 @@ class BehavioralLayer(Layer):
         if ((behavior := self.getBehavior(name)) is not None
             and not self.isEnabled(behavior)):
                 behavior.start()
-                self.enabled.append(behavior)
+                self.enabled[behavior] = None
         # END STUDENT CODE
         pass
 
@@ -40,7 +44,7 @@ class BehavioralLayer(Layer):
         if ((behavior := self.getBehavior(name)) is not None
             and self.isEnabled(behavior)):
                 behavior.pause()
-                self.enabled.remove(behavior)
+                del self.enabled[behavior]
         # END STUDENT CODE
         pass
 
@@ -60,22 +64,60 @@ class ExecutiveLayer(Layer):
         self.schedule = {}
         self.laststep = -1
         self.monitors = []
+        self.monitorsByName = {}
         super(ExecutiveLayer, self).__init__(agent)
         # Initialize any extra variables here
+        self.compileSchedule()
 
     def setSchedule(self, schedule):
         self.schedule = schedule
+        self.compileSchedule()
+
+    # Compile the schedule into a timeline: the times (in minutes) at which
+    #   any behavior starts or stops, the behaviors that are on from each of
+    #   those times until the next, and the behaviors that stop and start at
+    #   each.  self.cursor is the index of the current time in the timeline,
+    #   or None if the behaviors have to be brought in line with the schedule
+    def compileSchedule(self):
+        starts, stops = {}, {}
+        for name, times in self.schedule.items():
+            for (start_t, end_t) in times:
+                if (start_t < end_t):
+                    starts.setdefault(start_t, []).append(name)
+                    stops.setdefault(end_t, []).append(name)
+        counts = dict.fromkeys(self.schedule, 0)
+        self.timeline = [float('-inf')]
+        self.active = [set()]
+        self.changes = [([], [])]
+        for time in sorted(set(starts) | set(stops)):
+            for name in starts.get(time, []): counts[name] += 1
+            for name in stops.get(time, []): counts[name] -= 1
+            active = set(name for name in self.schedule if counts[name] > 0)
+            self.changes.append(
+                ([name for name in self.schedule
+                  if name in self.active[-1] and not name in active],
+                 [name for name in self.schedule
+                  if name in active and not name in self.active[-1]]))
+            self.timeline.append(time)
+            self.active.append(active)
+        self.cursor = None
+
+    # Whether the time (in minutes) is in the index'th part of the timeline
+    def inTimeline(self, index, t_min):
+        return (index < len(self.timeline) and self.timeline[index] <= t_min
+                and (index + 1 == len(self.timeline) or
+                     t_min < self.timeline[index + 1]))
 
     def requestNewSchedule(self):
         self.agent.getPlanningLayer().requestNewSchedule()
 
     def getMonitor(self, name):
-        for m in self.monitors:
-            if (m.name == name): return m
-        return None
+        return self.monitorsByName.get(name)
 
     def setMonitors(self, sensors, actuator_state, monitorsList):
         self.monitors = monitorsList
+        # Before activating, since monitors look each other up then
+        self.monitorsByName = {monitor.name: monitor for monitor in monitorsList}
         now = sensors.getTime()
         for monitor in self.monitors:
             monitor.setSensors(sensors)
@@ -92,21 +134,26 @@ class ExecutiveLayer(Layer):
         t_min = t / 60.0
         behavioral_layer = self.agent.getBehavioralLayer()
 
-        for behavior_name, times in self.schedule.items():
-            enable = False
-            for (start_t, end_t) in times:
-                if start_t <= t_min < end_t:
-                    enable = True
-            if not enable: # Disable
+        if (self.cursor is not None and self.inTimeline(self.cursor, t_min)):
+            pass # Nothing starts or stops
+        elif (self.cursor is not None and self.inTimeline(self.cursor + 1, t_min)):
+            # The next time in the timeline: just the changes
+            self.cursor += 1
+            stop, start = self.changes[self.cursor]
+            for behavior_name in stop: # Disable
                 behavioral_layer.pauseBehavior(behavior_name)
-
-        for behavior_name, times in self.schedule.items():
-            enable = False
-            for (start_t, end_t) in times:
-                if start_t <= t_min < end_t:
-                    enable = True
-            if enable: # Enable
+            for behavior_name in start: # Enable
                 behavioral_layer.startBehavior(behavior_name)
+        else:
+            # A new schedule, or time jumped (e.g., wrapped around midnight)
+            self.cursor = bisect.bisect_right(self.timeline, t_min) - 1
+            active = self.active[self.cursor]
+            for behavior_name in self.schedule:
+                if not behavior_name in active: # Disable
+                    behavioral_layer.pauseBehavior(behavior_name)
+            for behavior_name in self.schedule:
+                if behavior_name in active: # Enable
+                    behavioral_layer.startBehavior(behavior_name)
         # END STUDENT CODE
         for monitor in self.monitors:
             monitor.doMonitor()
@@ -120,6 +167,10 @@ class PlanningLayer(Layer):
         self.schedulerequested = True
         self.schedule = {}
         self.laststep = 0
+        # Schedule files (and functions that apply the settings that go with
+        #   them) posted from any thread, used at the next step
+        self.posted = queue.Queue()
+        self.worker = None
         super(PlanningLayer, self).__init__(agent)
 
     def setTestingSchedule(self, testschedule):
@@ -138,7 +189,27 @@ class PlanningLayer(Layer):
     def requestNewSchedule(self):
         self.schedulerequested = True
 
+    # Switch to the given schedule file at the next step (can be called from
+    #   any thread).  If apply is not None, it is called first, on the
+    #   control thread, to change any settings that go with the schedule
+    def postSchedule(self, schedulefile, apply=None):
+        self.posted.put((schedulefile, apply))
+
+    # Run function(*args) in the planning worker thread, so that doStep is
+    #   not blocked; if it returns a (schedule file, apply) pair, it is
+    #   posted, as for postSchedule
+    def planInBackground(self, function, *args):
+        if (self.worker is None):
+            self.worker = planning_worker.PlanningWorker(self.posted)
+        self.worker.submit(function, *args)
+
     def doStep(self, t):
+        while True:
+            try: schedulefile, apply = self.posted.get_nowait()
+            except queue.Empty: break
+            if (apply is not None): apply()
+            self.setTestingSchedule(schedulefile)
+            self.switch_to_test_sched()
         if self.schedulerequested or self.checkEnded(t):
             self.getNewSchedule()
         self.laststep = (t//60)%(24*60)
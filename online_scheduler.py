@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# Online (rolling-horizon) scheduling, for jobs that arrive while earlier
+#   ones are already running.
+# The scheduler keeps a current time and the current solution.  Each replan
+#   builds the JobScheduler model for the jobs that have not yet finished,
+#   freezes the tasks of the current solution that have already started,
+#   only lets the other tasks start at or after the current time, and
+#   re-solves with the current solution as a (complete) hint.  The current
+#   solution is always feasible for the new model (with any new jobs
+#   unscheduled), so CP-SAT starts from it and each replan can be given a
+#   short time limit
+import time
+from ortools.sat.python import cp_model
+import job_scheduler as js
+from parse_orders import parse_orders, read_items
+from verify_solution import verify_solution
+
+class OnlineScheduler(object):
+    # order: a JobScheduler with the machines, tasks, parts and tools that
+    #   the jobs can use; its jobs are not scheduled until added with add_jobs
+    # max_constraint: as for JobScheduler.create_model
+    # replan_time: time limit, in seconds, for the solve of each replan
+    # horizon: if None, the deadline is the order's deadline; otherwise, the
+    #   deadline of each replan is horizon hours after the current time
+    def __init__(self, order, max_constraint=7, replan_time=2.0, horizon=None,
+                 num_search_workers=None):
+        self.order = order
+        self.max_constraint = max_constraint
+        self.options = js.SolverOptions(num_search_workers, replan_time)
+        self.horizon = horizon
+        self.time = 1
+        self.jobs = []
+        self.solution = {}
+        # The solutions of the jobs that have finished (see _retire_finished)
+        self.finished = {}
+        # One dictionary per replan, with the time, number of jobs (and of
+        #   jobs in the model), deadline, build and solve times (in seconds),
+        #   status and objective
+        self.history = []
+
+    def add_jobs(self, jobs):
+        names = set(job.name for job in self.jobs)
+        for job in jobs:
+            if (job.name in names):
+                raise Exception("Job %s already added" %job.name)
+            names.add(job.name)
+            self.jobs.append(job)
+
+    # Move the current time forward.  The tasks of the current solution that
+    #   start before the new time are then frozen
+    def advance(self, time):
+        if (time < self.time):
+            raise Exception("Cannot go back in time from %d to %d"
+                            %(self.time, time))
+        self.time = time
+
+    def deadline(self):
+        return (self.order.deadline if self.horizon is None else
+                max(self.time + self.horizon, self._frozen_end()))
+
+    def _frozen_end(self):
+        return max([start + duration
+                    for sched_machines in self.solution.values()
+                    for _, start, duration in sched_machines
+                    if start < self.time], default=0)
+
+    # A JobScheduler for the given jobs, with the order's other items
+    def scheduler_for(self, jobs, deadline=None):
+        order = self.order
+        return js.JobScheduler(order.name, deadline or self.deadline(), jobs,
+                               order.tasks, order.machines, order.parts,
+                               order.tools, order.use_costs, order.use_parts)
+
+    # Jobs whose tasks have all ended by the current time can no longer
+    #   affect the machines or tools, so they are left out of the replans.
+    #   With parts constraints they are kept, since the parts they used or
+    #   made still count towards the parts levels
+    def _retire_finished(self):
+        order = self.order
+        if (order.use_parts and self.max_constraint >= 6 and order.parts):
+            return
+        for job in self.jobs:
+            sched_machines = self.solution.get(job.name)
+            if (job.name in self.finished or sched_machines is None
+                or len(sched_machines) < len(job.tasks)): continue
+            if (max([start + duration for _, start, duration
+                     in sched_machines]) <= self.time):
+                self.finished[job.name] = sched_machines
+
+    # Re-optimize the schedule from the current time and return the new
+    #   solution.  If the solve stops before finding a solution, the current
+    #   solution (which is still feasible) is kept
+    def replan(self):
+        start_time = time.perf_counter()
+        self._retire_finished()
+        scheduler = self.scheduler_for([job for job in self.jobs
+                                        if not job.name in self.finished])
+        scheduler.solver_options = self.options
+        scheduler.create_model(self.max_constraint)
+        current = {jname: sched_machines
+                   for jname, sched_machines in self.solution.items()
+                   if not jname in self.finished}
+        self._freeze(scheduler, current)
+        self._add_hints(scheduler, current)
+        build_time = time.perf_counter() - start_time
+
+        solution, solver = scheduler.solve()
+        if (scheduler.status == cp_model.INFEASIBLE):
+            raise Exception("Replan of %s at time %d is infeasible"
+                            %(self.order.name, self.time))
+        if (solution is not None):
+            self.solution = dict(self.finished)
+            self.solution.update(solution)
+        verification = verify_solution(self.scheduler_for(self.jobs,
+                                                          scheduler.deadline),
+                                       self.solution, self.max_constraint)
+        self.history.append({'time': self.time, 'jobs': len(self.jobs),
+                             'modeled_jobs': len(scheduler.jobs),
+                             'deadline': scheduler.deadline,
+                             'build_time': build_time,
+                             'solve_time': solver.WallTime(),
+                             'status': solver.StatusName(scheduler.status),
+                             'objective': verification.objective})
+        return self.solution
+
+    # Fix the tasks that have started, and keep the others from starting
+    #   before the current time
+    def _freeze(self, scheduler, solution):
+        model = scheduler.model
+        frozen = set()
+        for jname, sched_machines in solution.items():
+            tasks = scheduler.jobs_by_name[jname].tasks
+            for task, (mname, start, duration) in zip(tasks, sched_machines):
+                if (start >= self.time): continue
+                key = (jname, task.name, mname)
+                model.Add(scheduler.scheduleds[key] == True)
+                model.Add(scheduler.starts[key] == start)
+                frozen.add(key)
+        for key, start in scheduler.starts.items():
+            if (not key in frozen):
+                model.Add(start >= self.time).OnlyEnforceIf(
+                    scheduler.scheduleds[key])
+
+    # Hint the current solution, giving every variable of the model a value:
+    #   CP-SAT only reliably starts from a hint if it is complete
+    def _add_hints(self, scheduler, solution):
+        model = scheduler.model
+        variables = model.Proto().variables
+        planned = {}
+        for jname, sched_machines in solution.items():
+            tasks = scheduler.jobs_by_name[jname].tasks
+            for task, (mname, start, duration) in zip(tasks, sched_machines):
+                planned[jname, task.name, mname] = (start, start + duration)
+        for key, sched in scheduler.scheduleds.items():
+            start, end = scheduler.starts[key], scheduler.ends[key]
+            if (key in planned):
+                model.AddHint(sched, True)
+                model.AddHint(start, planned[key][0])
+                model.AddHint(end, planned[key][1])
+            else:
+                model.AddHint(sched, False)
+                model.AddHint(start, variables[start.Index()].domain[0])
+                model.AddHint(end, variables[end.Index()].domain[0])
+        for jname, job_sched in getattr(scheduler, 'job_scheduleds',
+                                        {}).items():
+            model.AddHint(job_sched, jname in solution)
+        verification = verify_solution(scheduler, solution,
+                                       self.max_constraint)
+        model.AddHint(scheduler.objective, verification.objective)
+        model.AddHint(scheduler.value, verification.value)
+        model.AddHint(scheduler.cost, verification.cost)
+
+# Replay the orders in filename, adding each job at its arrival time (the
+#   "arrival" parameter of its Job line, 1 if not given) and replanning
+#   whenever jobs arrive.  Prints the latency of each replan and compares the
+#   final objective with solving the order with all the jobs known up front
+def replay(filename, max_constraint=7, replan_time=2.0, horizon=None,
+           num_search_workers=None, offline=True):
+    job_items = read_items(filename)['Job']
+    for order in parse_orders(filename):
+        arrivals = {}
+        for job in order.jobs:
+            arrivals.setdefault(job_items[job.name].get('arrival', 1),
+                                []).append(job)
+        online = OnlineScheduler(order, max_constraint, replan_time, horizon,
+                                 num_search_workers)
+        print("Order %s: %d jobs arriving at %d times, replan time limit %.1fs"
+              %(order.name, len(order.jobs), len(arrivals), replan_time))
+        print("%6s %6s %8s %9s %9s %9s %10s %10s"
+              %("time", "jobs", "modeled", "build (s)", "solve (s)",
+                "total (s)", "status", "objective"))
+        for arrival in sorted(arrivals):
+            online.advance(arrival)
+            online.add_jobs(arrivals[arrival])
+            online.replan()
+            stats = online.history[-1]
+            print("%6d %6d %8d %9.3f %9.3f %9.3f %10s %10d"
+                  %(stats['time'], stats['jobs'], stats['modeled_jobs'],
+                    stats['build_time'], stats['solve_time'],
+                    stats['build_time'] + stats['solve_time'],
+                    stats['status'], stats['objective']))
+        latencies = [stats['build_time'] + stats['solve_time']
+                     for stats in online.history]
+        print("Replans: %d, mean latency %.3fs, max latency %.3fs"
+              %(len(latencies), sum(latencies)/len(latencies), max(latencies)))
+        verification = verify_solution(online.scheduler_for(online.jobs),
+                                       online.solution, max_constraint)
+        print("Final schedule: %s, objective %d"
+              %("valid" if verification.is_valid() else
+                "INVALID %s" %verification.violations,
+                verification.objective))
+        if (offline):
+            order.solver_options = js.SolverOptions(num_search_workers,
+                                                    replan_time*len(latencies))
+            order.create_model(max_constraint)
+            _, solver = order.solve()
+            print("Offline (all jobs known at time 1): %s"
+                  %order.solve_stats(solver))
+        print('')
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename',
+                        help='Order file whose Job lines have arrival times')
+    parser.add_argument('-c', '--max-constraint', default=7, type=int,
+                        help='Add all constraints <= this')
+    parser.add_argument('--replan-time', default=2.0, type=float,
+                        help='Time limit, in seconds, for each replan')
+    parser.add_argument('--horizon', default=None, type=int,
+                        help='Plan this many hours ahead of the current time '
+                        '(defaults to the order deadline)')
+    parser.add_argument('-w', '--workers', default=None, type=int,
+                        help='Number of parallel CP-SAT search workers')
+    parser.add_argument('--no-offline', action='store_true',
+                        help="Don't compare against solving the whole order")
+    args = parser.parse_args()
+
+    replay(args.filename, args.max_constraint, args.replan_time, args.horizon,
+           args.workers, not args.no_offline)
@@ -1,10 +1,6 @@
+import hashlib, os, pickle
 import job_scheduler as js
 
-def get(name, objects):
-    for object in objects:
-        if (name == object.name): return object
-    return None
-
 # For each parameter, if it is one of the allowable_params, add that to
 #  a dictionary.  The parameter can be a tuple, in which case the value
 #  is to be processed according to the type
@@ -50,21 +46,21 @@ def process_task_machines(items):
 def collect_tasks(jobs, items):
     tasks = set()
     for job in jobs:
-        tasks = tasks.union(items['Job'][job]['tasks'])
+        tasks.update(items['Job'][job]['tasks'])
     tasks = list(tasks); tasks.sort()
     return tasks
 
 def collect_parts(tasks, items):
     parts = set()
     for task in tasks:
-        parts = parts.union(items['Task'][task].get('parts', {}))
+        parts.update(items['Task'][task].get('parts') or [])
     parts = list(parts); parts.sort()
     return parts
 
 def collect_tools(tasks, items):
     tools = set()
     for task in tasks:
-        tools = tools.union(items['Task'][task].get('tools', {}))
+        tools.update(items['Task'][task].get('tools') or [])
     tools = list(tools); tools.sort()
     return tools
 
@@ -75,26 +71,57 @@ def create_order(order_name, deadline, machines_list, tasks_list, jobs_list,
     parts = [js.Part(name, quantity, cost)
              for name, quantity, cost in parts_list]
     tools = [js.Tool(name, num) for name, num in tools_list]
+    machines_by_name = {machine.name: machine for machine in machines}
+    parts_by_name = {part.name: part for part in parts}
+    tools_by_name = {tool.name: tool for tool in tools}
     tasks = []
+    tasks_by_name = {}
     for task_list in tasks_list:
         name = task_list[0]
         tnames = task_list[-3]; pnames = task_list[-2]; tms = task_list[-1]
+        task_tools = [tools_by_name.get(tname) for tname in tnames]
+        task_parts = [parts_by_name.get(pname) for pname in pnames]
         if (len(task_list) > 4): # It's a PartsTask
-            task = js.PartsTask(name, get(task_list[1], parts), task_list[2],
-                                [get(tname, tools) for tname in tnames],
-                                [get(pname, parts) for pname in pnames])
+            task = js.PartsTask(name, parts_by_name.get(task_list[1]),
+                                task_list[2], task_tools, task_parts)
         else:
-            task = js.Task(name, [get(tname, tools) for tname in tnames],
-                           [get(pname, parts) for pname in pnames])
-        task.addTaskMachineList([js.TaskMachine(task, get(mname, machines),
+            task = js.Task(name, task_tools, task_parts)
+        task.addTaskMachineList([js.TaskMachine(task,
+                                                machines_by_name.get(mname),
                                                 duration, value)
                                  for mname, duration, value in tms])
         tasks.append(task)
-    jobs = [js.Job(name, [get(task, tasks) for task in tnames])
+        tasks_by_name[name] = task
+    jobs = [js.Job(name, [tasks_by_name.get(task) for task in tnames])
             for name, tnames in jobs_list]
     return js.JobScheduler(order_name, deadline, jobs, tasks, machines,
                            parts, tools, use_costs, use_parts)
 
+# Return the arguments to create_order that recreate the order.  They are
+#   just names and numbers, so they can be pickled (e.g., to send the order
+#   to another process) without the JobScheduler and its model
+def order_data(order):
+    tasks_list = []
+    for task in order.tasks:
+        tnames = [tool.name for tool in task.tools]
+        pnames = [part.name for part in task.parts]
+        tms = [(tm.machine.name, tm.duration, tm.value)
+               for tm in task.task_machines]
+        if (isinstance(task, js.PartsTask)):
+            part = task.produced_part
+            tasks_list.append((task.name, part.name if part else None,
+                               task.quantity, tnames, pnames, tms))
+        else:
+            tasks_list.append((task.name, tnames, pnames, tms))
+    return (order.name, order.deadline,
+            [(machine.name, machine.energy_cost) for machine in order.machines],
+            tasks_list,
+            [(job.name, [task.name for task in job.tasks])
+             for job in order.jobs],
+            [(part.name, part.quantity, part.cost) for part in order.parts],
+            [(tool.name, tool.num) for tool in order.tools],
+            order.use_costs, order.use_parts)
+
 def process_order(order_name, order_dict, items):
     jobs = order_dict['jobs']
     tasks = collect_tasks(jobs, items)
@@ -133,32 +160,274 @@ item_params = {'Machine': ([('energy', int)], ['energy']),
                          'made-part', ('quantity', int)], []),
                'Task-Machine': ([('duration', int), ('value', int)],
                                 ['duration', 'value']),
-               'Job': ([('tasks', list)], ['tasks']),
+               'Job': ([('tasks', list), ('arrival', int)], ['tasks']),
                'Order': ([('deadline', int), ('jobs', list), ('machines', list),
                           ('use_costs', bool), ('use_parts', bool)],
                          ['deadline', 'jobs', 'machines'])}
 
-def parse_orders(filename):
-    # Dictionary whose keys are item name and values are dict of {name: params}
+# Raised for errors in an order file, giving the file and line number
+class OrderSyntaxError(Exception):
+    def __init__(self, filename, lineno, message):
+        super(OrderSyntaxError, self).__init__("%s:%d: %s"
+                                               %(filename, lineno, message))
+        self.filename = filename
+        self.lineno = lineno
+
+# Parse one line of an order file.  Return None if the line is blank (or
+#   just a comment), else a tuple (type, name, params)
+def parse_line(line):
+    l = line.split('#')[0].strip(' \n')
+    if (not l): return None
+    parts = [p.strip(' ').split(':') for p in l.replace(' ','').split(';')]
+    if (len(parts[0]) != 2):
+        raise Exception("Expected <item>: <name>, got: %s" %l)
+    type = parts[0][0]
+    name = parts[0][1]
+    item_param = item_params.get(type)
+    if (not item_param):
+        raise Exception("Unknown item: %s" %type)
+    if (type == 'Task-Machine' and len(name.split(',')) != 2):
+        raise Exception("Expected Task-Machine: <task>, <machine>, got: %s"
+                        %name)
+    return type, name, parse_attrs(type, name, parts[1:],
+                                   item_param[0], item_param[1])
+
+# Iterate over the (line number, (type, name, params)) of the items in the
+#   file, raising an OrderSyntaxError for any line that cannot be parsed
+def parse_lines(filename):
+    with open(filename) as f:
+        for lineno, line in enumerate(f, 1):
+            try:
+                item = parse_line(line)
+            except Exception as inst:
+                raise OrderSyntaxError(filename, lineno, inst.args[0])
+            if (item is not None): yield lineno, item
+
+def set_solver_options(order, solver_options):
+    if (solver_options is not None): order.solver_options = solver_options
+    return order
+
+# Read the item tables of an order file: a dictionary whose keys are item
+#   types and values are dict of {name: params}
+def read_items(filename):
     items = {}
     for item in item_params: items[item] = {}
-    with open(filename) as f:
-        for line in f.readlines():
-            l = line.split('#')[0].strip(' \n')
-            if l: 
-                parts = [p.strip(' ').split(':') for p in l.replace(' ','').split(';')]
-                type = parts[0][0]
-                name = parts[0][1]
-                item_param = item_params.get(type)
-                if (item_param):
-                    pvals = parse_attrs(type, name, parts[1:], 
-                                        item_param[0], item_param[1])
-                    items[type][name] = pvals
-                else:
-                    raise Exception("Unknown item: %s" %type)
+    for lineno, (type, name, pvals) in parse_lines(filename):
+        items[type][name] = pvals
     process_task_machines(items)
-    return process_orders(items)
+    return items
+
+# The parsed item tables of an order file can be cached in a pickle file
+#   next to it (only if asked for, e.g. with parse_orders(use_cache=True),
+#   so that reading an order file does not write files beside it).
+#   The cache is used if its version matches and the order file has
+#   the same modification time and size, or else the same contents (SHA-1),
+#   as when the cache was written
+cache_version = 1
+
+def cache_filename(filename):
+    dirname, basename = os.path.split(filename)
+    return os.path.join(dirname, "." + basename + ".cache")
+
+def file_digest(filename):
+    with open(filename, "rb") as f: return hashlib.sha1(f.read()).hexdigest()
+
+def write_items_cache(filename, items, stat, digest):
+    cache = cache_filename(filename)
+    try:
+        with open(cache + ".tmp", "wb") as f:
+            pickle.dump((cache_version, stat.st_mtime_ns, stat.st_size, digest),
+                        f, pickle.HIGHEST_PROTOCOL)
+            pickle.dump(items, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass # Caching is optional, e.g. if the directory is read-only
+
+# Like read_items, but loads the item tables from the cache if it is valid,
+#   and (re)writes the cache if not
+def read_items_cached(filename):
+    stat = os.stat(filename)
+    digest = None
+    try:
+        with open(cache_filename(filename), "rb") as f:
+            version, mtime, size, cached_digest = pickle.load(f)
+            if (version == cache_version and size == stat.st_size):
+                if (mtime == stat.st_mtime_ns): return pickle.load(f)
+                digest = file_digest(filename)
+                if (digest == cached_digest):
+                    items = pickle.load(f)
+                    write_items_cache(filename, items, stat, digest)
+                    return items
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        pass
+    items = read_items(filename)
+    write_items_cache(filename, items, stat, digest or file_digest(filename))
+    return items
+
+# If solver_options (a SolverOptions instance) is given, each order uses it
+#   when solved.  If use_cache, the parsed items are cached (see
+#   read_items_cached)
+def parse_orders(filename, solver_options=None, use_cache=False):
+    items = read_items_cached(filename) if use_cache else read_items(filename)
+    return [set_solver_options(order, solver_options)
+            for order in process_orders(items)]
+
+# Return the (type, name) of the first item the order depends on that has
+#   not been read yet, or None if all have: its machines, its jobs, the tasks
+#   of the jobs, at least one Task-Machine for each task (with the task name
+#   as its name) and the tools and parts the tasks use.
+# Jobs before first_job are not checked again.  Also returns the index of
+#   the job that is missing an item
+def missing_item(order_dict, items, task_machines, first_job=0):
+    for mname in order_dict['machines']:
+        if (not mname in items['Machine']): return ('Machine', mname), 0
+    jobs = order_dict['jobs']
+    for index in range(first_job, len(jobs)):
+        jname = jobs[index]
+        job = items['Job'].get(jname)
+        if (job is None): return ('Job', jname), index
+        for tname in job['tasks']:
+            task = items['Task'].get(tname)
+            if (task is None): return ('Task', tname), index
+            if (not task_machines.get(tname)): return ('Task-Machine', tname), index
+            for pname in task.get('parts') or []:
+                if (not pname in items['Part']): return ('Part', pname), index
+            for toolname in task.get('tools') or []:
+                if (not toolname in items['Tool']): return ('Tool', toolname), index
+    return None, len(jobs)
+
+# Single-pass version of parse_orders that yields each order (a
+#   JobScheduler) as soon as all the items it depends on have been read,
+#   so that orders can be solved while the rest of a large file is parsed.
+# Task-Machine lines are resolved as they are read.  An order uses the items
+#   as they are defined when it is yielded, so a Task-Machine line for one of
+#   its tasks that comes after that point raises an OrderSyntaxError at that
+#   line (parse_orders, which reads the whole file first, accepts it).
+# Orders whose items are still missing at the end of the file raise an
+#   OrderSyntaxError at the line of the order
+def iter_orders(filename, solver_options=None):
+    items = {}
+    for item in item_params: items[item] = {}
+    task_machines = {} # {task name: {machine name: (duration, value)}}
+    order_lines = {} # {order name: line number}
+    # Orders that are not ready, keyed by the (type, name) they wait for,
+    #   with the index of the first job that is not known to be ready
+    waiting = {}
+    used_tasks = {} # {task name: name of the yielded order that uses it}
+
+    def create(oname):
+        order_dict = items['Order'][oname]
+        for jname in order_dict['jobs']:
+            for tname in items['Job'][jname]['tasks']:
+                used_tasks.setdefault(tname, oname)
+                items['Task'][tname]['task-machines'] = \
+                    [(mname, duration, value) for mname, (duration, value)
+                     in task_machines[tname].items()]
+        return set_solver_options(process_order(oname, order_dict, items),
+                                  solver_options)
+
+    for lineno, (type, name, pvals) in parse_lines(filename):
+        items[type][name] = pvals
+        if (type == 'Task-Machine'):
+            tname, mname = name.split(',')
+            if (tname in used_tasks):
+                raise OrderSyntaxError(filename, lineno,
+                                       "Task-Machine %s, %s comes after order %s,"
+                                       " which uses task %s; with iter_orders,"
+                                       " it must come before the order"
+                                       %(tname, mname, used_tasks[tname], tname))
+            task_machines.setdefault(tname, {})[mname] = (pvals['duration'],
+                                                          pvals['value'])
+            name = tname
+        if (type == 'Order'):
+            order_lines[name] = lineno
+            onames = [(name, 0)]
+        else:
+            onames = waiting.pop((type, name), [])
+        for oname, first_job in onames:
+            missing, first_job = missing_item(items['Order'][oname], items,
+                                              task_machines, first_job)
+            if (missing is None):
+                del order_lines[oname]
+                yield create(oname)
+            else:
+                waiting.setdefault(missing, []).append((oname, first_job))
+
+    for oname, lineno in order_lines.items():
+        try:
+            order = create(oname)
+        except Exception as inst:
+            raise OrderSyntaxError(filename, lineno,
+                                   "Order %s refers to an undefined item: %s"
+                                   %(oname, inst))
+        yield order
+
+# Write the orders (JobScheduler instances) to a file, in the format read by
+#   parse_orders.  Items shared by several orders are written only once.
+# arrivals is an optional dictionary of job name: arrival time, for
+#   replaying the orders with online_scheduler
+def write_orders(filename, orders, arrivals=None):
+    written = set()
+    def write_item(f, type, name, params):
+        if ((type, name) in written): return
+        written.add((type, name))
+        f.write("; ".join(["%s: %s" %(type, name)] +
+                          [("%s: %s" %param) if param[1] is not None
+                           else param[0] for param in params]) + "\n")
+    def names(objects): return ", ".join([obj.name for obj in objects])
+
+    with open(filename, "w") as f:
+        for order in orders:
+            for machine in order.machines:
+                write_item(f, 'Machine', machine.name,
+                           [('energy', machine.energy_cost)])
+            for tool in order.tools:
+                write_item(f, 'Tool', tool.name, [('num', tool.num)])
+            for part in order.parts:
+                write_item(f, 'Part', part.name,
+                           [('num', part.quantity), ('cost', part.cost)])
+            for task in order.tasks:
+                params = []
+                if (task.tools): params.append(('tools', names(task.tools)))
+                if (task.parts): params.append(('parts', names(task.parts)))
+                if (isinstance(task, js.PartsTask)):
+                    params += [('made-part', task.produced_part.name),
+                               ('quantity', task.quantity)]
+                write_item(f, 'Task', task.name, params)
+                for tm in task.task_machines:
+                    write_item(f, 'Task-Machine',
+                               "%s, %s" %(task.name, tm.machine.name),
+                               [('duration', tm.duration),
+                                ('value', tm.value)])
+            for job in order.jobs:
+                params = [('tasks', names(job.tasks))]
+                if (arrivals and job.name in arrivals):
+                    params.append(('arrival', arrivals[job.name]))
+                write_item(f, 'Job', job.name, params)
+            params = [('deadline', order.deadline),
+                      ('jobs', names(order.jobs)),
+                      ('machines', names(order.machines))]
+            if (order.use_costs): params.append(('use_costs', None))
+            if (order.use_parts): params.append(('use_parts', None))
+            write_item(f, 'Order', order.name, params)
 
 if __name__ == '__main__':
-    orders = parse_orders("grader_files/orders.txt")
-    for order in orders: print(order)
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', nargs='?', default="grader_files/orders.txt",
+                        help='The order file to parse')
+    parser.add_argument('-S', '--solve', action='store_true',
+                        help='Solve each order and print the solver statistics')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache the parsed items in a file next to the order file')
+    js.add_solver_arguments(parser)
+    args = parser.parse_args()
+
+    orders = parse_orders(args.filename, js.solver_options_from_args(args),
+                          args.cache)
+    for order in orders:
+        print(order)
+        if (args.solve):
+            order.create_model(7)
+            solution, solver = order.solve()
+            print("  %s" %order.solve_stats(solver))
@@ -0,0 +1,42 @@
+# A worker thread for planning that is too slow to run in the agent's control
+#   loop (e.g., ScheduleMonitor's nightly plant measurement and schedule
+#   solving, which would otherwise stop behaviors from stepping and sensors
+#   from being logged until it is done).
+# Jobs are run one at a time, in the order submitted, and each result (unless
+#   it is None) is put on the results queue, which the control loop polls.
+# A thread, rather than a process, so that jobs can use the monitors' state;
+#   CP-SAT and the vision models spend most of their time outside the GIL
+import queue, threading, time, traceback
+
+class PlanningWorker(object):
+    def __init__(self, results, name="PlanningWorker"):
+        self.results = results
+        self.jobs = queue.Queue()
+        self.last_duration = None
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    # Run function(*args) in the worker thread
+    def submit(self, function, *args):
+        self.jobs.put((function, args))
+
+    # The number of jobs submitted but not yet done
+    def pending(self):
+        return self.jobs.unfinished_tasks
+
+    # Wait until all the submitted jobs are done
+    def wait(self):
+        self.jobs.join()
+
+    def run(self):
+        while True:
+            function, args = self.jobs.get()
+            start = time.perf_counter()
+            try:
+                result = function(*args)
+            except Exception:
+                traceback.print_exc()
+                result = None
+            self.last_duration = time.perf_counter() - start
+            if (result is not None): self.results.put(result)
+            self.jobs.task_done()
@@ -1,12 +1,18 @@
 import matplotlib.pyplot as plt
 import re
 
+# Times can also have seconds (HH:MM:SS), for sub-minute schedules, in
+#   which case the minutes are fractional
 def HHMM_to_mins(HHMM):
     parts = HHMM.split(":")
-    return int(parts[0])*60 + int(parts[1])
+    mins = int(parts[0])*60 + int(parts[1])
+    if (len(parts) > 2 and int(parts[2]) != 0): mins += int(parts[2])/60
+    return mins
 
 def mins_to_HHMM(mins):
-    return "%.2d:%.2d" %(int(mins/60), mins%60)
+    secs = round(mins*60)
+    if (secs % 60 == 0): return "%.2d:%.2d" %(secs//3600, secs//60%60)
+    return "%.2d:%.2d:%.2d" %(secs//3600, secs//60%60, secs%60)
 
 
 def readSchedule(file):
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# A persistent cache of solved greenhouse schedules.
+# ScheduleMonitor picks from a few BehaviorInfo presets each night, so the
+#   same GreenhouseScheduler problems are solved over and over.  Each solved
+#   problem is stored in schedules/cache, in a JSON file named by a digest of
+#   its canonicalized behaviors_info, minutes_per_chunk and max_constraint,
+#   with the chunks each behavior is scheduled for (or null, if the problem
+#   is infeasible).  A repeated problem then returns the stored schedule, and
+#   writes the same schedule file, without solving.
+# A problem is only stored as infeasible if the solver proved it so; a solve
+#   that stops at its time limit without a schedule is not stored, so that it
+#   can be solved again, rather than be remembered as infeasible.
+# Entries are touched when used, and the least recently used ones are
+#   removed when there are more than max_entries.
+# Use "python schedule_cache.py warmup" to pre-solve the combinations of
+#   ScheduleMonitor's presets
+import hashlib, itertools, json, os
+import visualize_solution
+from ortools.sat.python import cp_model
+from greenhouse_scheduler import BehaviorInfo, GreenhouseScheduler, \
+     outputSchedule
+
+# Change this if the scheduler changes in a way that invalidates the entries
+cache_version = 2
+
+default_directory = os.path.join("schedules", "cache")
+
+# ScheduleMonitor's default behaviors, and its presets for the Light and
+#   RaiseMoist behaviors, by frequency
+def defaultBehaviorsInfo():
+    # Light should be on for at least 8 hours during the day (not on at night)
+    #   Instances can be scheduled back-to-back (0 min time) but
+    #   at least every 4 hours during the day
+    behaviors_info = {}
+    behaviors_info["Light"] =      BehaviorInfo(8*60,     0,    0, 4*60)
+    behaviors_info["LowerHumid"] = BehaviorInfo(8*60, 12*60,   30, 2*60)
+    behaviors_info["LowerTemp"] =  BehaviorInfo(4*60, 12*60, 2*60, 4*60)
+    behaviors_info["RaiseTemp"] =  BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    behaviors_info["LowerMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    behaviors_info["RaiseMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+    # camera should not be on at all at night
+    behaviors_info["TakeImage"] =  BehaviorInfo(1*60, 0,     3*60, 6*60)
+    return behaviors_info
+
+lightPresets = {'low':  BehaviorInfo(8*60, 0, 0, 4*60),
+                'med':  BehaviorInfo(10*60, 0, 0, 4*60),
+                'high': BehaviorInfo(12*60, 0, 0, 4*60)}
+raiseMoistPresets = {'low':  BehaviorInfo(2*60, 12*60, 2*60, 4*60),
+                     'med':  BehaviorInfo(3*60, 12*60, 2*60, 4*60),
+                     'high': BehaviorInfo(4*60, 12*60, 2*60, 4*60)}
+
+# A digest of the contents of a file (or None, if there is no file), so that
+#   a key changes when the file does
+def fileDigest(filename):
+    if (filename is None): return None
+    with open(filename, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+# The problem in a canonical form: behaviors sorted by name, and all times
+#   as integers (or floats, if they are not whole minutes).  The objective
+#   weights (an ObjectiveWeights) are only included if given, so that
+#   feasibility-only entries keep their keys; they include a digest of the
+#   ambient light file, since the objective depends on its contents
+def canonicalProblem(behaviors_info, minutes_per_chunk, max_constraint,
+                     weights=None):
+    def number(x): return int(x) if x == int(x) else float(x)
+    problem = {'version': cache_version,
+               'minutes_per_chunk': number(minutes_per_chunk),
+               'max_constraint': max_constraint,
+               'behaviors_info': [[behavior, number(info.min_extent),
+                                   number(info.night_extent),
+                                   number(info.min_spacing),
+                                   number(info.max_spacing)]
+                                  for behavior, info
+                                  in sorted(behaviors_info.items())]}
+    if (weights is not None):
+        problem['weights'] = {'on_chunks': number(weights.on_chunks),
+                              'switches': number(weights.switches),
+                              'ambient_light': number(weights.ambient_light),
+                              'actuators': {actuator: number(weight)
+                                            for actuator, weight
+                                            in weights.actuators.items()},
+                              'ambient_file': weights.ambient_file,
+                              'ambient_digest':
+                                  fileDigest(weights.ambient_file)}
+    return problem
+
+def cacheKey(behaviors_info, minutes_per_chunk, max_constraint, weights=None):
+    problem = canonicalProblem(behaviors_info, minutes_per_chunk,
+                               max_constraint, weights)
+    return hashlib.sha256(json.dumps(problem, sort_keys=True)
+                          .encode()).hexdigest()[:32]
+
+class ScheduleCache(object):
+    def __init__(self, directory=default_directory, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def entryFilename(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    # Return (True, chunk_times) if the problem is in the cache, where
+    #   chunk_times is {behavior: [chunk]}, or None if the problem is
+    #   infeasible, and (False, None) if it is not
+    def lookup(self, behaviors_info, minutes_per_chunk, max_constraint=4,
+               weights=None):
+        filename = self.entryFilename(cacheKey(behaviors_info,
+                                               minutes_per_chunk,
+                                               max_constraint, weights))
+        try:
+            with open(filename) as f: entry = json.load(f)
+            problem = canonicalProblem(behaviors_info, minutes_per_chunk,
+                                       max_constraint, weights)
+            if (entry['problem'] == problem):
+                os.utime(filename)
+                return True, entry['chunk_times']
+        except (OSError, ValueError, KeyError):
+            pass
+        return False, None
+
+    def store(self, behaviors_info, minutes_per_chunk, max_constraint,
+              chunk_times, weights=None):
+        key = cacheKey(behaviors_info, minutes_per_chunk, max_constraint,
+                       weights)
+        filename = self.entryFilename(key)
+        entry = {'problem': canonicalProblem(behaviors_info, minutes_per_chunk,
+                                             max_constraint, weights),
+                 'chunk_times': chunk_times}
+        try:
+            with open(filename + ".tmp", "w") as f: json.dump(entry, f)
+            os.replace(filename + ".tmp", filename)
+        except OSError:
+            return
+        self.evict()
+
+    # Remove the least recently used entries, beyond max_entries
+    def evict(self):
+        entries = self.entries()
+        for filename in entries[:max(0, len(entries) - self.max_entries)]:
+            try: os.remove(filename)
+            except OSError: pass
+
+    # The entry files, least recently used first
+    def entries(self):
+        filenames = [os.path.join(self.directory, name)
+                     for name in os.listdir(self.directory)
+                     if name.endswith(".json")]
+        return sorted(filenames, key=os.path.getmtime)
+
+    def clear(self):
+        for filename in self.entries(): os.remove(filename)
+
+    # Like GreenhouseScheduler(behaviors_info, minutes_per_chunk, sched_file,
+    #   max_constraint, weights, max_time_in_seconds).solveProblem(visualize,
+    #   verbose), but returns the cached schedule (and writes it to
+    #   sched_file) if there is one
+    def solve(self, behaviors_info, minutes_per_chunk, sched_file=None,
+              max_constraint=4, visualize=False, verbose=False, weights=None,
+              max_time_in_seconds=None):
+        found, chunk_times = self.lookup(behaviors_info, minutes_per_chunk,
+                                         max_constraint, weights)
+        if (not found):
+            self.misses += 1
+            problem = GreenhouseScheduler(behaviors_info, minutes_per_chunk,
+                                          sched_file, max_constraint, weights,
+                                          max_time_in_seconds)
+            assigned_jobs_list = problem.solveProblem(visualize, verbose)
+            if (problem.status in (cp_model.OPTIMAL, cp_model.FEASIBLE)):
+                self.store(behaviors_info, minutes_per_chunk, max_constraint,
+                           problem.chunk_times, weights)
+            elif (problem.status == cp_model.INFEASIBLE):
+                self.store(behaviors_info, minutes_per_chunk, max_constraint,
+                           None, weights)
+            return assigned_jobs_list
+
+        self.hits += 1
+        if (chunk_times is None):
+            if verbose: print("infeasible")
+            return None
+        if verbose: print("feasible")
+        # In the caller's order of the behaviors
+        chunk_times = {behavior: chunk_times[behavior]
+                       for behavior in behaviors_info}
+        assigned_jobs_list = outputSchedule(chunk_times, minutes_per_chunk,
+                                            sched_file, verbose)
+        if visualize:
+            visualize_solution.plot_binary(chunk_times.keys(),
+                                           24*60//minutes_per_chunk/2, False,
+                                           0.5, assigned_jobs_list)
+        return assigned_jobs_list
+
+# Solve each combination of the Light and RaiseMoist presets (with the other
+#   behaviors at their defaults), so that they are in the cache
+def warmUp(cache, minutes_per_chunk=30, max_constraint=4, verbose=True,
+           max_time_in_seconds=None):
+    for light, moist in itertools.product(lightPresets, raiseMoistPresets):
+        behaviors_info = defaultBehaviorsInfo()
+        behaviors_info["Light"] = lightPresets[light]
+        behaviors_info["RaiseMoist"] = raiseMoistPresets[moist]
+        found, _ = cache.lookup(behaviors_info, minutes_per_chunk,
+                                max_constraint)
+        feasible = (cache.solve(behaviors_info, minutes_per_chunk,
+                                max_constraint=max_constraint,
+                                max_time_in_seconds=max_time_in_seconds)
+                    is not None)
+        if (verbose):
+            print("Light %-4s RaiseMoist %-4s: %s%s"
+                  %(light, moist, "feasible" if feasible else "no schedule",
+                    " (already cached)" if found else ""))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('command', choices=['warmup', 'list', 'clear'],
+                        help='warmup: solve all the preset combinations; '
+                        'list: show the cached problems; clear: empty the cache')
+    parser.add_argument('-d', '--directory', default=default_directory)
+    parser.add_argument('-m', '--minutes-per-chunk', default=30, type=int)
+    parser.add_argument('-c', '--max-constraint', default=4, type=int)
+    parser.add_argument('-n', '--max-entries', default=64, type=int)
+    parser.add_argument('-t', '--time-limit', default=None, type=float,
+                        help='time limit, in seconds, for each solve')
+    args = parser.parse_args()
+
+    cache = ScheduleCache(args.directory, args.max_entries)
+    if (args.command == 'warmup'):
+        warmUp(cache, args.minutes_per_chunk, args.max_constraint,
+               max_time_in_seconds=args.time_limit)
+    elif (args.command == 'list'):
+        for filename in cache.entries():
+            with open(filename) as f: entry = json.load(f)
+            problem = entry['problem']
+            print("%s: %d minutes, constraints <= %d, %s"
+                  %(os.path.basename(filename)[:-5],
+                    problem['minutes_per_chunk'], problem['max_constraint'],
+                    "infeasible" if entry['chunk_times'] is None else
+                    "feasible"))
+            for behavior in problem['behaviors_info']:
+                print("  %-10s <%s, %s, %s, %s>" %tuple(behavior))
+    else:
+        cache.clear()
@@ -1,6 +1,8 @@
 from monitor import *
 from terrabot_utils import clock_time, time_since_midnight
-from greenhouse_scheduler import BehaviorInfo, GreenhouseScheduler
+from schedule_cache import ScheduleCache, defaultBehaviorsInfo, \
+     lightPresets, raiseMoistPresets
+from greenhouse_scheduler import explainInfeasibility, relaxBehaviorsInfo
 
 import os
 from computer_vision import classify, measure, vision, color_correct, cv_utils
@@ -12,9 +14,20 @@ class ScheduleMonitor(Monitor):
     base_insolation_target = 8500
     seedling_insolation_target = 9000
     mature_insolation_target = 9500
+    # The insolation targets that go with the Light presets
+    lightTargets = {'low': base_insolation_target,
+                    'med': seedling_insolation_target,
+                    'high': mature_insolation_target}
+
+    # Time limit, in seconds, for each solve of the nightly plan (so that a
+    #   hard problem cannot hold up the new schedule indefinitely)
+    plan_time_limit = 10
     
-    def __init__(self, period=10): # Perceive every 10 seconds
+    # asynchronous: measure the plants and solve the new schedule in the
+    #   planning layer's worker thread, so that the control loop does not stall
+    def __init__(self, period=10, asynchronous=True): # Perceive every 10 seconds
         super(ScheduleMonitor, self).__init__("ScheduleMonitor", period)
+        self.asynchronous = asynchronous
         self.plant_height = 0
         self.greenery = 0
         self.day = 1
@@ -38,6 +51,8 @@ class ScheduleMonitor(Monitor):
         # Create directory for new schedules
         if not os.path.exists("./schedules"):
             os.makedirs("./schedules")
+        # Schedules already solved for the same behaviors
+        self.scheduleCache = ScheduleCache()
     
     def get_most_recent_image(self):
         # Gets most recent image from saved images from camera behavior
@@ -81,41 +96,42 @@ class ScheduleMonitor(Monitor):
         )
     
     def reset_behaviors_info(self):
-        # Light should be on for at least 8 hours during the day (not on at night)
-        #   Instances can be scheduled back-to-back (0 min time) but
-        #   at least every 4 hours during the day
-        self.behaviors_info = {}
-        self.behaviors_info["Light"] =      BehaviorInfo(8*60,     0,    0, 4*60)
-        self.behaviors_info["LowerHumid"] = BehaviorInfo(8*60, 12*60,   30, 2*60)
-        self.behaviors_info["LowerTemp"] =  BehaviorInfo(4*60, 12*60, 2*60, 4*60)
-        self.behaviors_info["RaiseTemp"] =  BehaviorInfo(2*60, 12*60, 2*60, 4*60)
-        self.behaviors_info["LowerMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
-        self.behaviors_info["RaiseMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
-        # camera should not be on at all at night
-        self.behaviors_info["TakeImage"] =  BehaviorInfo(1*60, 0,     3*60, 6*60)
-
-        self.setLightLowFreqSchedule()
-        self.setRaiseSmoistLowFreqSchedule()
-        self.dailyWaterLimit = 60
+        self.behaviors_info, self.dailyWaterLimit = self.reset_settings()
+
+    # The behaviors and daily water limit to reset to.  The defaults and
+    #   presets are in schedule_cache, so that all their combinations can be
+    #   solved ahead of time
+    def reset_settings(self):
+        behaviors_info = defaultBehaviorsInfo()
+        behaviors_info["Light"] = lightPresets['low']
+        behaviors_info["RaiseMoist"] = raiseMoistPresets['low']
+        return behaviors_info, 60
     
     def setLightLowFreqSchedule(self):
-        self.behaviors_info["Light"] = BehaviorInfo(8*60, 0, 0, 4*60)
+        self.behaviors_info["Light"] = lightPresets['low']
     
     def setLightMedFreqSchedule(self):
-        self.behaviors_info["Light"] = BehaviorInfo(10*60, 0, 0, 4*60)
+        self.behaviors_info["Light"] = lightPresets['med']
     
     def setLightHighFreqSchedule(self):
-        self.behaviors_info["Light"] = BehaviorInfo(12*60, 0, 0, 4*60)
+        self.behaviors_info["Light"] = lightPresets['high']
     
     def setRaiseSmoistLowFreqSchedule(self):
-        self.behaviors_info["RaiseMoist"] = BehaviorInfo(2*60, 12*60, 2*60, 4*60)
+        self.behaviors_info["RaiseMoist"] = raiseMoistPresets['low']
     
     def setRaiseSmoistMedFreqSchedule(self):
-        self.behaviors_info["RaiseMoist"] = BehaviorInfo(3*60, 12*60, 2*60, 4*60)
+        self.behaviors_info["RaiseMoist"] = raiseMoistPresets['med']
     
     def setRaiseSmoistHighFreqSchedule(self):
-        self.behaviors_info["RaiseMoist"] = BehaviorInfo(4*60, 12*60, 2*60, 4*60)
+        self.behaviors_info["RaiseMoist"] = raiseMoistPresets['high']
     
+    # The insolation target of the longest Light preset that is no longer
+    #   than light_info
+    def insolationTarget(self, light_info):
+        return max([self.lightTargets[preset] for preset in lightPresets
+                    if lightPresets[preset].min_extent <= light_info.min_extent],
+                   default=self.base_insolation_target)
+
     def getDailyWaterLimit(self): # Accessed by RaiseSoilMoisture Behavior
         return self.dailyWaterLimit
 
@@ -132,6 +148,22 @@ class ScheduleMonitor(Monitor):
         
         # Only create schedule changes at around midnight of the next day
         print("SCHEDULE MONITOR ACTIVATED")
+        planningLayer = self.getExecutive().agent.getPlanningLayer()
+        if self.asynchronous:
+            planningLayer.planInBackground(self.plan)
+        else:
+            schedule_fname, applyStage = self.plan()
+            applyStage()
+            planningLayer.postSchedule(schedule_fname)
+
+    # Measure the plants, pick the behaviors for their stage, and solve the
+    #   next day's schedule.  Returns the name of the schedule file, and a
+    #   function that applies the stage's settings (the light target, the
+    #   daily water limit and the behaviors).  Behaviors and monitors read
+    #   those as they step, so plan only computes them, and they are applied
+    #   on the control thread (by the planning layer, when it switches to the
+    #   schedule, if planning in the background)
+    def plan(self):
         self.get_most_recent_image()
         self.calibratePlantHeight()
 
@@ -140,49 +172,77 @@ class ScheduleMonitor(Monitor):
             print("Estimated Stage: Germination")
 
             print("Light Bucket: low freq, low insolation")
-            self.lightMonitor.setTarget(self.base_insolation_target)
-            self.setLightLowFreqSchedule()
+            light = 'low'
 
             print("Water Bucket: low freq, low limit")
-            self.setRaiseSmoistLowFreqSchedule()
-            self.dailyWaterLimit = 80
+            moist, limit = 'low', 80
         elif self.plant_height < self.mature_height_threshold:
             print("Estimated Stage: Seedling")
 
             print("Light Bucket: high freq, med insolation")
-            self.lightMonitor.setTarget(self.seedling_insolation_target)
-            self.setLightMedFreqSchedule()
+            light = 'med'
 
             print("Water Bucket: high freq, high limit")
-            self.setRaiseSmoistMedFreqSchedule()
-            self.dailyWaterLimit = 100
+            moist, limit = 'med', 100
         else:
             print("Estimated Stage: Mature")
 
             print("Light Bucket: high freq, high insolation")
-            self.lightMonitor.setTarget(self.mature_insolation_target)
-            self.setLightHighFreqSchedule()
+            light = 'high'
 
             print("Water Bucket: low freq, high limit")
-            self.setRaiseSmoistHighFreqSchedule()
-            self.dailyWaterLimit = 100
+            moist, limit = 'high', 100
+        behaviors_info = dict(self.behaviors_info)
+        behaviors_info["Light"] = lightPresets[light]
+        behaviors_info["RaiseMoist"] = raiseMoistPresets[moist]
+        target = self.lightTargets[light]
         
         schedule_fname = f"./schedules/new_schedule_day_{self.day+1}.txt"
-        problem = GreenhouseScheduler(self.behaviors_info, 30, schedule_fname)
         VISUALIZE_SCHEDULE = False
         
-        if problem.solveProblem(visualize=VISUALIZE_SCHEDULE) is None:
-            print(f"FAILURE: could not create new schedule for day {self.day+1}. Resetting behaviors...\n")
-            self.reset_behaviors_info()
-            self.lightMonitor.setTarget(self.base_insolation_target)
-
-            problem = GreenhouseScheduler(self.behaviors_info, 30, schedule_fname)
-            problem.solveProblem(visualize=VISUALIZE_SCHEDULE)
+        if self.scheduleCache.solve(behaviors_info, 30, schedule_fname,
+                                    visualize=VISUALIZE_SCHEDULE,
+                                    max_time_in_seconds=self.plan_time_limit) is None:
+            # Relax just the behaviors whose constraints conflict, keeping
+            #   the rest of the stage's tuning (if no conflict is found in
+            #   time, nothing is relaxed, and the behaviors are reset).
+            #   The relaxed behaviors are just for tonight's schedule: the
+            #   next night starts from the stage's behaviors again
+            conflict = explainInfeasibility(
+                behaviors_info, 30,
+                max_time_in_seconds=self.plan_time_limit) or []
+            relaxed = relaxBehaviorsInfo(behaviors_info, conflict,
+                                         defaultBehaviorsInfo())
+            changed = [behavior for behavior in relaxed
+                       if repr(relaxed[behavior]) != repr(behaviors_info[behavior])]
+            if changed and self.scheduleCache.solve(relaxed, 30, schedule_fname,
+                                                    visualize=VISUALIZE_SCHEDULE,
+                                                    max_time_in_seconds=self.plan_time_limit) is not None:
+                print(f"RELAXED: {conflict} conflict, so created new schedule for day {self.day+1} with relaxed {', '.join(changed)}.\n")
+                # The lights cannot give more light than they are on for
+                if "Light" in changed:
+                    target = self.insolationTarget(relaxed["Light"])
+            else:
+                print(f"FAILURE: could not create new schedule for day {self.day+1}. Resetting behaviors...\n")
+                behaviors_info, limit = self.reset_settings()
+                target = self.base_insolation_target
+
+                self.scheduleCache.solve(behaviors_info, 30, schedule_fname,
+                                         visualize=VISUALIZE_SCHEDULE,
+                                         max_time_in_seconds=self.plan_time_limit)
         else:
             print(f"SUCCESS: created new schedule for day {self.day+1}.\n")
-        
-        planningLayer = self.getExecutive().agent.getPlanningLayer()
-        planningLayer.setTestingSchedule(schedule_fname)
-        planningLayer.switch_to_test_sched()
+
+        def applyStage():
+            self.behaviors_info = behaviors_info
+            self.lightMonitor.setTarget(target)
+            self.dailyWaterLimit = limit
+            # RaiseMoist reads the limit at midnight, which (if planning in
+            #   the background) is before the plan is done
+            behavioralLayer = self.getExecutive().agent.getBehavioralLayer()
+            raiseMoist = behavioralLayer.getBehavior("RaiseMoistBehavior")
+            if raiseMoist is not None:
+                raiseMoist.updateDailyLimit()
 
         self.day += 1
+        return schedule_fname, applyStage
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# Telemetry for the CP-SAT solves throughout the project.
+# Solves that go through solver_telemetry.solve write a record to a
+#   JSON-lines file with the model size (variables, and constraints by
+#   type), presolve and solve times, branches, conflicts, status, objective
+#   and bound.  Nothing is recorded unless a sink file is set, either with
+#   set_sink (e.g., from the --telemetry argument of add_solver_arguments) or
+#   with the SOLVER_TELEMETRY environment variable, which also reaches
+#   processes started by this one (e.g., by batch_solve).
+# Use "python solver_telemetry.py <file>" for a summary of the records
+import json, os, threading, time
+from ortools.sat.python import cp_model, cp_model_helper
+
+sink_variable = 'SOLVER_TELEMETRY'
+
+# Appends records to a JSON-lines file, one line per solve.  Each record is
+#   written with a single write to a file opened for appending, so several
+#   threads or processes can share the file
+class TelemetrySink(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, sort_keys=True) + "\n"
+        with self.lock:
+            with open(self.filename, "a") as f: f.write(line)
+
+_sink = (TelemetrySink(os.environ[sink_variable])
+         if os.environ.get(sink_variable) else None)
+
+# Send the telemetry records to filename (or stop recording, if None)
+def set_sink(filename):
+    global _sink
+    if (filename is None):
+        _sink = None
+        os.environ.pop(sink_variable, None)
+    else:
+        _sink = TelemetrySink(filename)
+        os.environ[sink_variable] = filename
+
+def is_recording(): return _sink is not None
+
+# Return the number of variables of the model and a dictionary of the
+#   number of constraints of each type, as counted by CP-SAT
+#   (e.g., {'kLinear2': 56, 'kNoOverlap': 11})
+def model_stats(model):
+    variables = 0
+    constraints = {}
+    stats = cp_model_helper.CpSatHelper.model_stats(model.Proto())
+    for line in stats.split("\n"):
+        if (not line.startswith("#") or not ":" in line): continue
+        kind, rest = line[1:].split(":", 1)
+        count = int(rest.split()[0].replace("'", ""))
+        if (kind == 'Variables'): variables = count
+        elif (kind.startswith('k')): constraints[kind] = count
+    return variables, constraints
+
+# Solve the model with the solver (a CpSolver whose parameters have been
+#   set) and return the status, as solver.Solve does.  If a sink is set,
+#   also write a record for the solve, under the given name (e.g.,
+#   "JobScheduler.solve") and with any additional fields (e.g., order=name).
+# The presolve time is when CP-SAT logs that the presolved model is being
+#   loaded, so the search log is turned on (but only printed if
+#   log_search_progress was already set)
+def solve(solver, model, name, callback=None, **fields):
+    if (_sink is None): return solver.Solve(model, callback)
+
+    variables, constraints = model_stats(model)
+    params = solver.parameters
+    log_search, log_to_stdout = params.log_search_progress, params.log_to_stdout
+    params.log_search_progress = True
+    params.log_to_stdout = log_search and log_to_stdout
+    presolved = []
+    start = time.perf_counter()
+    def log_line(line):
+        if (not presolved and line.startswith("Preloading model")):
+            presolved.append(time.perf_counter() - start)
+    solver.log_callback = log_line
+    try:
+        status = solver.Solve(model, callback)
+    finally:
+        params.log_search_progress = log_search
+        params.log_to_stdout = log_to_stdout
+        solver.log_callback = None
+
+    has_solution = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    has_objective = model.Proto().has_objective()
+    record = dict(fields, name=name, timestamp=time.time(), pid=os.getpid(),
+                  variables=variables, constraints=constraints,
+                  num_constraints=sum(constraints.values()),
+                  status=solver.StatusName(status),
+                  objective=(solver.ObjectiveValue()
+                             if has_objective and has_solution else None),
+                  bound=(solver.BestObjectiveBound()
+                         if has_objective else None),
+                  presolve_time=presolved[0] if presolved else None,
+                  solve_time=solver.WallTime(), user_time=solver.UserTime(),
+                  deterministic_time=solver.ResponseProto().deterministic_time,
+                  branches=solver.NumBranches(),
+                  conflicts=solver.NumConflicts())
+    _sink.write(record)
+    return status
+
+def read_records(filename):
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# Print, for each name, the number of solves, their total, mean and maximum
+#   solve times, mean presolve time, mean model size and statuses, with the
+#   names that took the most total time first
+def summarize(records):
+    by_name = {}
+    for record in records:
+        by_name.setdefault(record['name'], []).append(record)
+    print("%-32s %6s %10s %9s %9s %9s %10s %10s  %s"
+          %("name", "solves", "total (s)", "mean (s)", "max (s)",
+            "presolve", "variables", "constrs", "statuses"))
+    for name, group in sorted(by_name.items(),
+                              key=lambda item: -sum(r['solve_time']
+                                                    for r in item[1])):
+        times = [r['solve_time'] for r in group]
+        presolves = [r['presolve_time'] for r in group
+                     if r['presolve_time'] is not None]
+        statuses = {}
+        for r in group: statuses[r['status']] = statuses.get(r['status'], 0) + 1
+        print("%-32s %6d %10.3f %9.4f %9.4f %9s %10d %10d  %s"
+              %(name, len(group), sum(times), sum(times)/len(times),
+                max(times),
+                "%.4f" %(sum(presolves)/len(presolves)) if presolves else "-",
+                sum(r['variables'] for r in group)/len(group),
+                sum(r['num_constraints'] for r in group)/len(group),
+                ", ".join(["%s: %d" %item for item in sorted(statuses.items())])))
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename', help='The JSON-lines telemetry file')
+    parser.add_argument('-n', '--name', default=None,
+                        help='Only summarize the solves with this name')
+    args = parser.parse_args()
+
+    records = read_records(args.filename)
+    if (args.name): records = [r for r in records if r['name'] == args.name]
+    summarize(records)
@@ -0,0 +1,175 @@
+# Check a JobScheduler solution directly, without building and solving a
+#   CP-SAT model.
+# The checks mirror the constraints added by JobScheduler.create_model:
+#   task start and end times within the schedule, one machine per task,
+#   machine no-overlap, task ordering, job completeness, and the tool and
+#   parts reservoirs.  The reservoirs are checked with a sweep over the
+#   start/end events of the scheduled tasks, in time order
+from job_scheduler import PartsTask
+
+# The types of violations, in the order of the create_model constraints
+violation_types = ['format', 'window', 'machine', 'ordering', 'completion',
+                   'tools', 'parts', 'objective']
+
+# A constraint that the solution does not satisfy.
+# jobs: the names of the jobs involved
+# time: for the machine and reservoir violations, the time at which the
+#   constraint is first violated
+class Violation(object):
+    def __init__(self, type, message, jobs=(), time=None):
+        self.type = type
+        self.message = message
+        self.jobs = list(jobs)
+        self.time = time
+
+    def __repr__(self):
+        return "<Violation %s: %s>" %(self.type, self.message)
+
+# The result of verify_solution: the violations found (empty if the
+#   solution is valid), and the value, cost and objective of the solution
+class Verification(object):
+    def __init__(self, violations, value, cost, objective):
+        self.violations = violations
+        self.value = value
+        self.cost = cost
+        self.objective = objective
+
+    def is_valid(self): return len(self.violations) == 0
+
+    def __repr__(self):
+        return ("<Verification %s: (%d %d %d)%s>"
+                %("VALID" if self.is_valid() else "INVALID", self.objective,
+                  self.value, self.cost,
+                  "".join(["\n  %s" %v for v in self.violations])))
+
+# Check the solution (in the format returned by JobScheduler.solve) against
+#   the constraints of order (a JobScheduler) up to max_constraint, as in
+#   JobScheduler.create_model.
+# The tuples of each job's solution are matched to the job's tasks in order
+def verify_solution(order, solution, max_constraint=7):
+    violations = []
+    value = cost = 0
+    by_machine = {}         # machine name: [(start, end, job name)]
+    tool_events = {}        # tool name: [(time, demand, job name)]
+    part_events = {}        # part name: [(time, demand, job name)]
+    check_resources = order.use_parts
+    for jname, sched_machines in solution.items():
+        job = order.jobs_by_name.get(jname)
+        if (job is None):
+            violations.append(Violation('format', "Unknown job %s" %jname,
+                                        [jname]))
+            continue
+        if (len(sched_machines) > len(job.tasks)):
+            violations.append(Violation('format', "Job %s has %d tasks, not %d"
+                                        %(jname, len(job.tasks),
+                                          len(sched_machines)), [jname]))
+            continue
+        if (max_constraint >= 4 and len(sched_machines) > 0
+            and len(sched_machines) < len(job.tasks)):
+            violations.append(Violation('completion',
+                                        "Only %d of the %d tasks of job %s "
+                                        "are scheduled"
+                                        %(len(sched_machines), len(job.tasks),
+                                          jname), [jname]))
+        previous = None
+        for task, (mname, start, duration) in zip(job.tasks, sched_machines):
+            tm = _task_machine(task, mname)
+            if (tm is None):
+                violations.append(Violation('format',
+                                            "Task %s of job %s cannot be done "
+                                            "on %s" %(task.name, jname, mname),
+                                            [jname]))
+                continue
+            if (duration != tm.duration):
+                violations.append(Violation('format',
+                                            "Task %s of job %s takes %d on %s, "
+                                            "not %d" %(task.name, jname,
+                                                       tm.duration, mname,
+                                                       duration), [jname]))
+            end = start + tm.duration
+            if (start < 1 or end > order.deadline):
+                violations.append(Violation('window',
+                                            "Task %s of job %s (%d-%d) is not "
+                                            "within 1-%d"
+                                            %(task.name, jname, start, end,
+                                              order.deadline), [jname]))
+            if (max_constraint >= 3 and previous is not None
+                and start < previous[1]):
+                violations.append(Violation('ordering',
+                                            "Task %s of job %s starts at %d, "
+                                            "before task %s ends at %d"
+                                            %(task.name, jname, start,
+                                              previous[0].name, previous[1]),
+                                            [jname]))
+            previous = (task, end)
+
+            value += tm.value
+            cost += (tm.duration*tm.machine.energy_cost +
+                     sum(p.cost for p in task.parts))
+            by_machine.setdefault(mname, []).append((start, end, jname))
+            if (check_resources):
+                for tool in task.tools:
+                    events = tool_events.setdefault(tool.name, [])
+                    events.append((start, 1, jname))
+                    events.append((end, -1, jname))
+                for part in task.parts:
+                    part_events.setdefault(part.name, []).append((start, 1,
+                                                                 jname))
+                # A made part that no task in the order uses is not
+                #   collected, so it is not a reservoir (as in create_model)
+                if (isinstance(task, PartsTask)
+                    and task.produced_part is not None):
+                    part_events.setdefault(task.produced_part.name, []).append(
+                        (end, -task.quantity, jname))
+
+    if (max_constraint >= 2):
+        for mname, intervals in by_machine.items():
+            intervals.sort()
+            last_end, last_job = 0, None
+            for start, end, jname in intervals:
+                if (start < last_end):
+                    violations.append(Violation('machine',
+                                                "Jobs %s and %s overlap on %s "
+                                                "at %d" %(last_job, jname,
+                                                          mname, start),
+                                                [last_job, jname], start))
+                if (end > last_end): last_end, last_job = end, jname
+    if (check_resources and max_constraint >= 5):
+        for tool in order.tools:
+            _check_reservoir(violations, 'tools', tool.name,
+                             tool_events.get(tool.name, []), tool.num)
+    if (check_resources and max_constraint >= 6):
+        for part in order.parts:
+            _check_reservoir(violations, 'parts', part.name,
+                             part_events.get(part.name, []), part.quantity)
+
+    use_costs = order.use_costs and max_constraint >= 7
+    objective = value - cost if use_costs else value
+    if (objective < 0 or value > 1000000 or (use_costs and cost > 1000000)):
+        violations.append(Violation('objective',
+                                    "Objective %d (value %d, cost %d) is out "
+                                    "of range" %(objective, value, cost)))
+    return Verification(violations, value, cost if use_costs else 0, objective)
+
+def _task_machine(task, mname):
+    for tm in task.task_machines:
+        if (tm.machine.name == mname): return tm
+    return None
+
+# As with CP-SAT's reservoir constraint, the level starts at 0, and after
+#   all the events at each time have been applied, it must be between 0 and
+#   max_level.  Only the first time the level is out of range is reported
+def _check_reservoir(violations, type, name, events, max_level):
+    events.sort(key=lambda event: event[0])
+    level = 0
+    for i, (time, demand, jname) in enumerate(events):
+        level += demand
+        if (i+1 < len(events) and events[i+1][0] == time): continue
+        if (level < 0 or level > max_level):
+            jobs = sorted(set(event[2] for event in events
+                              if event[0] == time))
+            violations.append(Violation(type, "%s level is %d at %d, not "
+                                        "within 0-%d"
+                                        %(name, level, time, max_level),
+                                        jobs, time))
+            return